@@ -1,7 +1,14 @@
 from django.contrib import admin
+from django.db import connection
+from django.db.models import Q
 from django.utils.html import mark_safe
 
 from .models import Species, SubSpecies
+from .search import search_subspecies_ids
+
+
+# The matched ids are passed as query parameters, which SQLite caps at 999
+ADMIN_SEARCH_IDS_LIMIT = 500
 
 
 @admin.register(Species)
@@ -22,6 +29,27 @@ class SubSpeciesAdmin(admin.ModelAdmin):
                      'scientific_name', 'main_species__name')
     ordering = ('common_name',)
     readonly_fields = ['image_preview']
+    list_select_related = ('main_species',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # The trigram indexes serve the default search on PostgreSQL,
+        # elsewhere the names are matched by the in-process index
+        if connection.vendor == 'postgresql':
+            return super().get_search_results(request, queryset, search_term)
+
+        words = search_term.split()
+        limit = ADMIN_SEARCH_IDS_LIMIT // max(len(words), 1)
+        for word in words:
+            ids = search_subspecies_ids(word, limit=limit + 1)
+            if len(ids) > limit:
+                # Too broad to list the matches, so scan the names instead
+                names = Q(common_name__icontains=word) \
+                    | Q(scientific_name__icontains=word) \
+                    | Q(main_species__name__icontains=word)
+            else:
+                names = Q(id__in=ids)
+            queryset = queryset.filter(names | Q(input_code__icontains=word))
+        return queryset, False
 
     def thumb(self, obj):
         img_url = obj.image.url if obj.image else ''
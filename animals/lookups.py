@@ -1,11 +1,11 @@
 from ajax_select import register, LookupChannel
 
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
 
-from permits.models import Status
+from permits.permitted import get_permitted_species
 
 from .models import SubSpecies
+from .search import search_subspecies
 
 
 class SubSpeciesLookupMixin:
@@ -28,12 +28,7 @@ class SubSpeciesLookup(SubSpeciesLookupMixin, LookupChannel):
     model = SubSpecies
 
     def get_query(self, q, request):
-        query = \
-            Q(common_name__icontains=q) | \
-            Q(scientific_name__icontains=q) | \
-            Q(main_species__name__icontains=q)
-        qs = self.model.objects.filter(query).order_by('common_name')
-        return qs
+        return search_subspecies(q)
 
     def check_auth(self, request):
         if not request.user.is_authenticated:
@@ -45,15 +40,8 @@ class PermittedSubSpeciesLookup(SubSpeciesLookupMixin, LookupChannel):
     model = SubSpecies
 
     def get_query(self, q, request):
-        client = request.user.subclass
-        query =  \
-            (Q(common_name__icontains=q)
-             | Q(scientific_name__icontains=q)
-             | Q(main_species__name__icontains=q))  \
-            & (Q(species_permitted__wcp__client=client)
-               & Q(species_permitted__wcp__status=Status.RELEASED))
-        qs = self.model.objects.filter(query).order_by('common_name')
-        return qs
+        permitted = get_permitted_species(request.user.id)
+        return search_subspecies(q, permitted.ids)
 
     def check_auth(self, request):
         if not request.user.is_authenticated:
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField, Q
+from django.db.models.functions import Lower
+
+from .models import SubSpecies
+
+
+# Number of results shown by the autocomplete lookups
+SEARCH_RESULTS_LIMIT = 50
+
+# Number of ranked matches of a query that are cached
+SEARCH_CANDIDATES_LIMIT = 5000
+
+SEARCH_CACHE_TIMEOUT = 60 * 10
+SEARCH_VERSION_CACHE_KEY = 'animals:search:version'
+
+# Number of queries whose results are kept by the in-process index
+HOT_QUERIES_SIZE = 1024
+
+
+def normalize(text):
+    return ' '.join(str(text).casefold().split())
+
+
+def get_search_version():
+    """
+    Return the version of the species catalog, which changes whenever
+    a species or a sub species is saved or deleted.
+
+    It's kept in the shared cache, so a change made in any process is seen
+    by all the others on their next search.
+    """
+    version = cache.get(SEARCH_VERSION_CACHE_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(SEARCH_VERSION_CACHE_KEY, version, timeout=None):
+            version = cache.get(SEARCH_VERSION_CACHE_KEY, version)
+    return version
+
+
+def invalidate_search():
+    cache.set(SEARCH_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+
+
+def _rank(q, common_name, scientific_name, main_species_name):
+    if common_name == q:
+        return 0
+    if common_name.startswith(q):
+        return 1
+    if scientific_name.startswith(q):
+        return 2
+    if main_species_name.startswith(q):
+        return 3
+    return 4
+
+
+def _trigrams(text):
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+
+class SubSpeciesSearchIndex:
+    """
+    In-process trigram index of the names of the sub species, used on the
+    databases without trigram indexes (e.g. SQLite).
+
+    A query of three characters or more is only checked against the sub
+    species that have all of its trigrams, and the results of the hot
+    queries are kept.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.entries = {}
+        self.grams = {}
+        self.hot_queries = OrderedDict()
+        self.lock = threading.Lock()
+
+        rows = SubSpecies.objects \
+            .values_list('id', 'common_name', 'scientific_name',
+                         'main_species__name') \
+            .iterator()
+        for id_, *names in rows:
+            names = tuple(normalize(name) for name in names)
+            self.entries[id_] = names
+            for gram in _trigrams('\0'.join(names)):
+                self.grams.setdefault(gram, set()).add(id_)
+
+    def search(self, q, allowed_ids=None, cached=True):
+        if cached:
+            with self.lock:
+                if q in self.hot_queries:
+                    self.hot_queries.move_to_end(q)
+                    return self.hot_queries[q]
+
+        if len(q) >= 3:
+            postings = sorted((self.grams.get(gram, set())
+                               for gram in _trigrams(q)), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self.entries.keys()
+        if allowed_ids is not None:
+            candidates = candidates & set(allowed_ids)
+
+        matches = []
+        for id_ in candidates:
+            names = self.entries[id_]
+            if any(q in name for name in names):
+                matches.append((_rank(q, *names), names[0], id_))
+        matches.sort()
+        ids = [id_ for _, _, id_ in matches]
+        if not cached:
+            return ids
+
+        ids = ids[:SEARCH_CANDIDATES_LIMIT]
+        with self.lock:
+            self.hot_queries[q] = ids
+            if len(self.hot_queries) > HOT_QUERIES_SIZE:
+                self.hot_queries.popitem(last=False)
+        return ids
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _search_in_process(q, version, allowed_ids, cached):
+    global _index  # pylint: disable=global-statement
+    # The index is rebuilt while holding the lock, so the concurrent searches
+    # of a new version wait for a single build instead of each loading the
+    # whole catalog. That's one query over the sub species, which only
+    # happens after they change, on the databases without trigram indexes.
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = SubSpeciesSearchIndex(version)
+        index = _index
+    return index.search(q, allowed_ids, cached)
+
+
+def _search_in_database(q, allowed_ids=None, limit=None):
+    # The icontains lookups are served by the trigram indexes on the names
+    rank = Case(
+        When(common_name__iexact=q, then=Value(0)),
+        When(common_name__istartswith=q, then=Value(1)),
+        When(scientific_name__istartswith=q, then=Value(2)),
+        When(main_species__name__istartswith=q, then=Value(3)),
+        default=Value(4),
+        output_field=IntegerField())
+    subspecies = SubSpecies.objects \
+        .filter(
+            Q(common_name__icontains=q)
+            | Q(scientific_name__icontains=q)
+            | Q(main_species__name__icontains=q))
+    if allowed_ids is not None:
+        subspecies = subspecies.filter(id__in=allowed_ids)
+    ids = subspecies \
+        .annotate(search_rank=rank) \
+        .order_by('search_rank', Lower('common_name'), 'id') \
+        .values_list('id', flat=True)
+    if limit is not None:
+        ids = ids[:limit]
+    return list(ids)
+
+
+def search_subspecies_ids(q, allowed_ids=None, limit=SEARCH_CANDIDATES_LIMIT):
+    """
+    Return the ids of the sub species whose common, scientific or main
+    species name contains q, best matches first: an exact common name, then
+    names starting with q, then the rest, each by common name.
+
+    Only the sub species in allowed_ids are searched when it's given, and
+    at most limit ids are returned, or all of them when it's None. The
+    results of the searches of the whole catalog are cached until it
+    changes, up to SEARCH_CANDIDATES_LIMIT of them.
+    """
+    q = normalize(q)
+    if not q:
+        return []
+
+    version = get_search_version()
+    cached = allowed_ids is None and limit is not None \
+        and limit <= SEARCH_CANDIDATES_LIMIT
+    if connection.vendor != 'postgresql':
+        return _search_in_process(q, version, allowed_ids, cached)[:limit]
+    if not cached:
+        return _search_in_database(q, allowed_ids, limit)
+
+    key = f'animals:search:{version}:{md5(q.encode("utf-8")).hexdigest()}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = _search_in_database(q, limit=SEARCH_CANDIDATES_LIMIT)
+        cache.set(key, ids, timeout=SEARCH_CACHE_TIMEOUT)
+    return ids[:limit]
+
+
+def search_subspecies(q, allowed_ids=None, limit=SEARCH_RESULTS_LIMIT):
+    """Return the best matching sub species for q, with their main species,
+    searching only the ones in allowed_ids when it's given."""
+    ids = search_subspecies_ids(q, allowed_ids, limit)
+
+    subspecies = SubSpecies.objects \
+        .select_related('main_species') \
+        .in_bulk(ids)
+    return [subspecies[id_] for id_ in ids if id_ in subspecies]
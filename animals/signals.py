@@ -0,0 +1,16 @@
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import Species, SubSpecies
+from .search import invalidate_search
+
+
+@receiver(post_save, sender=Species)
+@receiver(post_delete, sender=Species)
+@receiver(post_save, sender=SubSpecies)
+@receiver(post_delete, sender=SubSpecies)
+def invalidate_search_on_catalog_change(sender, **kwargs):
+    # Once committed, so a concurrent search cannot cache the old rows under
+    # the new version
+    transaction.on_commit(invalidate_search)
@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, F
+from django.db.models.functions import TruncMonth, ExtractYear, ExtractMonth
+
+from users.batching import batch_on_commit
+from permits.models import (
+    TransportEntry,
+    TransportStatistic,
+    LocalTransportPermit,
+    Status
+)
+
+from .models import Species
+
+
+def get_transport_stats(year, client=None, use_rollup=None):
+    """
+    Return the species x month matrix of transported quantities for a year.
+
+    The totals come from a single query grouped by transport month and main
+    species; the cells without transports are filled with zeros in memory.
+    When a client is given, only the transports of that client are counted.
+    """
+    if use_rollup is None:
+        use_rollup = settings.TRANSPORT_STATISTICS_ROLLUP
+
+    if use_rollup:
+        filters = {
+            'year': year,
+            'status__in': [Status.RELEASED, Status.USED]
+        }
+        if client is not None:
+            filters['client'] = client
+        totals = TransportStatistic.objects \
+            .filter(**filters) \
+            .values('month', 'species') \
+            .annotate(total=Sum(F('quantity'))) \
+            .order_by()
+        totals = [(row['species'], row['month'], row['total'])
+                  for row in totals]
+    else:
+        filters = {
+            'ltp__status__in': [Status.RELEASED, Status.USED],
+            'ltp__transport_date__year': year
+        }
+        if client is not None:
+            filters['ltp__client'] = client
+        totals = TransportEntry.objects \
+            .filter(**filters) \
+            .annotate(month=TruncMonth('ltp__transport_date')) \
+            .values('month', 'sub_species__main_species') \
+            .annotate(total=Sum(F('quantity'))) \
+            .order_by()
+        totals = [(row['sub_species__main_species'], row['month'].month,
+                   row['total']) for row in totals]
+
+    matrix = {}
+    for species_id, month, total in totals:
+        months = matrix.setdefault(species_id, [0] * 12)
+        months[month - 1] += total or 0
+
+    data = {}
+    for species_id, name in Species.objects.values_list('id', 'name'):
+        months = matrix.get(species_id, [0] * 12)
+        if name in data:
+            data[name] = [a + b for a, b in zip(data[name], months)]
+        else:
+            data[name] = months
+    return data
+
+
+def get_client_transport_totals(year, months):
+    """Return the transported quantities per client id for the given months,
+    read from the rollup."""
+    totals = TransportStatistic.objects \
+        .filter(
+            year=year,
+            month__in=months,
+            status__in=[Status.RELEASED, Status.USED]) \
+        .values('client') \
+        .annotate(total=Sum(F('quantity'))) \
+        .order_by()
+    return {row['client']: row['total'] or 0 for row in totals}
+
+
+def _statistics_from_entries(entries):
+    rows = entries \
+        .annotate(
+            year=ExtractYear('ltp__transport_date'),
+            month=ExtractMonth('ltp__transport_date')) \
+        .values('year', 'month', 'sub_species__main_species',
+                'ltp__client', 'ltp__status') \
+        .annotate(total=Sum(F('quantity'))) \
+        .order_by()
+    for row in rows.iterator():
+        yield TransportStatistic(
+            year=row['year'],
+            month=row['month'],
+            species_id=row['sub_species__main_species'],
+            client_id=row['ltp__client'],
+            status=row['ltp__status'],
+            quantity=row['total'] or 0)
+
+
+def get_transport_statistic_slices(ltp_ids):
+    """Return the (year, month, client) slices of the rollup the given
+    local transport permits fall into."""
+    ltp_ids = [ltp_id for ltp_id in ltp_ids if ltp_id is not None]
+    if not ltp_ids:
+        return set()
+
+    slices = set()
+    permits = LocalTransportPermit.objects \
+        .filter(id__in=ltp_ids) \
+        .values_list('transport_date', 'client')
+    for transport_date, client_id in permits:
+        slices.add((transport_date.year, transport_date.month, client_id))
+    return slices
+
+
+def refresh_transport_statistic_slices(slices):
+    """Rebuild the given slices of the rollup from their transport entries,
+    so calling this again is harmless."""
+    with transaction.atomic():
+        for year, month, client_id in slices:
+            TransportStatistic.objects.filter(
+                year=year, month=month, client_id=client_id).delete()
+            entries = TransportEntry.objects.filter(
+                ltp__transport_date__year=year,
+                ltp__transport_date__month=month,
+                ltp__client_id=client_id)
+            TransportStatistic.objects.bulk_create(
+                _statistics_from_entries(entries))
+
+
+def refresh_transport_statistics(ltp_ids):
+    """Recompute the rollup rows touched by the given local transport
+    permits."""
+    refresh_transport_statistic_slices(
+        get_transport_statistic_slices(ltp_ids))
+
+
+class StatisticsRefresh:
+    """The local transport permits changed in one transaction, refreshed
+    once when it commits."""
+
+    def __init__(self):
+        self.ltp_ids = set()
+        self.slices = set()
+
+    def add(self, ltp_ids, slices=()):
+        # The slices are looked up the first time a permit is seen, so they
+        # are still refreshed when it's deleted or moved before the commit
+        self.slices.update(slices)
+        new_ids = set(ltp_ids) - self.ltp_ids
+        if new_ids:
+            self.ltp_ids.update(new_ids)
+            self.slices.update(get_transport_statistic_slices(new_ids))
+
+    def __call__(self):
+        refresh_transport_statistic_slices(
+            self.slices | get_transport_statistic_slices(self.ltp_ids))
+
+
+def refresh_transport_statistics_on_commit(ltp_ids, slices=()):
+    """
+    Refresh the rollup rows of the given local transport permits, and the
+    given extra slices, once the current transaction commits.
+
+    The permits of a whole transaction are collected, so saving many
+    transport entries of the same permit rebuilds its slice only once.
+    """
+    ltp_ids = {ltp_id for ltp_id in ltp_ids if ltp_id is not None}
+    if not ltp_ids and not slices:
+        return
+
+    refresh = batch_on_commit('transport_statistics', StatisticsRefresh)
+    if refresh is None:
+        refresh_transport_statistic_slices(
+            set(slices) | get_transport_statistic_slices(ltp_ids))
+    else:
+        refresh.add(ltp_ids, slices)
+
+
+def rebuild_transport_statistics(batch_size=1000):
+    """Rebuild the whole rollup from the transport entries."""
+    with transaction.atomic():
+        TransportStatistic.objects.all().delete()
+        entries = TransportEntry.objects.filter(ltp__isnull=False)
+        TransportStatistic.objects.bulk_create(
+            _statistics_from_entries(entries), batch_size=batch_size)
+    return TransportStatistic.objects.count()
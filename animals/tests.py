@@ -1,3 +1,52 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from users.models import Client
+from permits.models import (
+    Status,
+    WildlifeFarmPermit,
+    WildlifeCollectorPermit,
+    LocalTransportPermit,
+    TransportEntry,
+    TransportStatistic
+)
+
+from .models import Species, SubSpecies
+
+
+class TransportStatisticTest(TransactionTestCase):
+    # The rollup is refreshed when the transactions commit
+
+    def setUp(self):
+        species = Species.objects.create(name='Butterfly', type='FAUNA')
+        self.sub_species = SubSpecies.objects.create(
+            main_species=species, input_code='B1',
+            common_name='Butterfly', scientific_name='Papilio')
+        self.client_user = Client.objects.create(
+            username='client', email='client@example.com')
+        self.wfp = WildlifeFarmPermit.objects.create(
+            permit_no='WFP-1', status=Status.RELEASED, client=self.client_user)
+        self.wcp = WildlifeCollectorPermit.objects.create(
+            permit_no='WCP-1', status=Status.RELEASED, client=self.client_user)
+
+    def get_statistics(self):
+        return set(TransportStatistic.objects.values_list(
+            'year', 'month', 'quantity'))
+
+    def test_moved_permit_leaves_its_previous_slice(self):
+        with transaction.atomic():
+            ltp = LocalTransportPermit.objects.create(
+                permit_no='LTP-1', status=Status.RELEASED,
+                client=self.client_user, wfp=self.wfp, wcp=self.wcp,
+                transport_location='Manila', transport_date=date(2024, 1, 15))
+            TransportEntry.objects.create(
+                sub_species=self.sub_species, ltp=ltp, quantity=5,
+                description='Live')
+        self.assertEqual(self.get_statistics(), {(2024, 1, 5)})
+
+        ltp.transport_date = date(2024, 3, 1)
+        with transaction.atomic():
+            ltp.save()
+        self.assertEqual(self.get_statistics(), {(2024, 3, 5)})
@@ -1,5 +1,4 @@
 import base64
-import calendar
 import datetime
 import json
 from typing import Any
@@ -9,19 +8,14 @@ from django.views.generic import TemplateView
 from django.views.generic import RedirectView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db.models import Sum, F
 from django.core.exceptions import PermissionDenied
 
 from users.views import CustomLoginRequiredMixin
 from users.models import Client
 
-from permits.models import (
-    TransportEntry,
-    Status
-)
 from permits.tasks import generate_reports
 
-from .models import Species
+from .stats import get_transport_stats
 
 
 def get_current_quarter():
@@ -49,28 +43,10 @@ class TransportStatsView(CustomLoginRequiredMixin, TemplateView):
             'quarter', get_current_quarter()))
         context['year'] = selected_year
         context['quarter'] = selected_quarter
-        data = {}
-        for month in range(1, 13):
-            from_date = f'{selected_year}-{month:02d}-01'
-            to_date = f'{selected_year}-{month:02d}-{calendar.monthrange(selected_year, month)[1]}'
-
-            for species in Species.objects.all():
-                if species.name not in data:
-                    data[species.name] = []
-
-                filters = {
-                    'ltp__status__in': [Status.RELEASED, Status.USED],
-                    'ltp__transport_date__gte': from_date,
-                    'ltp__transport_date__lte': to_date,
-                    'sub_species__main_species': species
-                }
-                if isinstance(self.request.user.subclass, Client):
-                    filters['ltp__client'] = self.request.user.subclass
-
-                total = TransportEntry.objects \
-                    .filter(**filters) \
-                    .aggregate(total=Sum(F('quantity')))['total']
-                data[species.name].append(total or 0)
+        client = None
+        if isinstance(self.request.user.subclass, Client):
+            client = self.request.user.subclass
+        data = get_transport_stats(selected_year, client=client)
 
         context['data'] = base64.urlsafe_b64encode(
             json.dumps(data).encode('utf-8')).decode('utf-8')
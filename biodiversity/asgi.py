@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'biodiversity.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the apps are loaded
+from users.stream import NOTIFICATION_STREAM_PATH, notification_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # The notification streams are served without Django's request cycle,
+    # so an idle stream holds a connection and not a thread
+    if scope['type'] == 'http' and scope['path'] == NOTIFICATION_STREAM_PATH:
+        return await notification_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
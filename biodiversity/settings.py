@@ -132,6 +132,8 @@ else:
 AUTH_USER_MODEL = 'users.User'
 
 AUTHENTICATION_BACKENDS = (
+    'users.backends.SubclassModelBackend',
+    # Keeps the sessions started before the subclass backend valid
     'django.contrib.auth.backends.ModelBackend',
 )
 
@@ -287,6 +289,15 @@ CELERY_WORKER_CONCURRENCY = int(os.getenv('CELERY_WORKER_CONCURRENCY', '4'))
 
 CELERY_TIMEZONE = TIME_ZONE
 
+# The published tasks are kept in the outbox for this long, and so are
+# their dedup keys
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
+# The PayMongo webhook events are handled by their own queue
+CELERY_TASK_ROUTES = {
+    'payments.tasks.process_paymongo_events': {'queue': 'payments'}
+}
+
 CELERY_BEAT_SCHEDULE = {
     'check_permit_validity': {
         'task': 'permits.tasks.check_permit_validity',
@@ -295,6 +306,20 @@ CELERY_BEAT_SCHEDULE = {
 }
 
 
+# CACHE
+
+# Shared by the web processes and the workers, so a counter or a cached
+# value changed by one of them is seen by all the others. It's kept apart
+# from the broker's database
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://redis:6379/1'),
+        'KEY_PREFIX': 'biodiversity',
+    }
+}
+
+
 # Permits
 
 VALIDITY = {
@@ -305,12 +330,35 @@ VALIDITY = {
     'GratuitousPermit': int(os.getenv('VALIDITY_DAYS_GP', '30'))
 }
 
+# Read the transport stats and reports from the precomputed rollup table
+TRANSPORT_STATISTICS_ROLLUP = json.loads(
+    os.getenv('TRANSPORT_STATISTICS_ROLLUP', 'false'))
+
+
+# NOTIFICATIONS
+
+# Redis where the workers publish new notifications for the streams of the
+# web processes. When set to an empty value the stream is disabled, and the
+# browsers poll the unread count instead.
+NOTIFICATION_STREAM_REDIS_URL = os.getenv(
+    'NOTIFICATION_STREAM_REDIS_URL', CELERY_BROKER_URL)
+
+
+# AUDIT LOG
+
+# Hand the admin log entries of the workflow actions to a task instead of
+# inserting them when the request's transaction commits
+AUDIT_LOG_DEFERRED = json.loads(os.getenv('AUDIT_LOG_DEFERRED', 'false'))
+
 
 # PAYMONGO
 
 PAYMONGO = {
     'SECRET_KEY': os.getenv('PAYMONGO_SECRET_KEY'),
-    'STATEMENT_DESCRIPTOR': os.getenv('PAYMONGO_STATEMENT_DESCRIPTOR', 'DENR-PENRO')
+    'STATEMENT_DESCRIPTOR': os.getenv('PAYMONGO_STATEMENT_DESCRIPTOR', 'DENR-PENRO'),
+    'API_BASE_URL': os.getenv('PAYMONGO_API_BASE_URL', 'https://api.paymongo.com'),
+    'CONNECT_TIMEOUT': float(os.getenv('PAYMONGO_CONNECT_TIMEOUT', '3.05')),
+    'READ_TIMEOUT': float(os.getenv('PAYMONGO_READ_TIMEOUT', '10'))
 }
 
 
@@ -34,7 +34,7 @@ class PaymentOrderItemInline(admin.TabularInline):
 
 @admin.register(PaymentOrder)
 class PaymentOrderAdmin(AdminMixin, admin.ModelAdmin):
-    list_display = ('no', 'permit_application',
+    list_display = ('no', 'permit_application', 'total',
                     'paid', 'created_by', 'prepared_by', 'approved_by', 'created_at', 'released_at')
     autocomplete_fields = ('permit_application', 'client', 'created_by')
     search_fields = ('no', 'permit_application__no')
@@ -140,13 +140,13 @@ class PaymentOrderAdmin(AdminMixin, admin.ModelAdmin):
 
         # Check if it's been signed by the prepared_by
         if 'add_sign' in request.POST and obj.prepared_by_signature \
-                and obj.prepared_by_signature.person == request.user:
+                and obj.prepared_by_signature.person_id == request.user.id:
             payment_order_prepared.send(
                 sender=request.user, payment_order=obj)
 
         # Check if it's been signed by the approved_by
         if 'add_sign' in request.POST and obj.approved_by_signature \
-                and obj.approved_by_signature.person == request.user:
+                and obj.approved_by_signature.person_id == request.user.id:
             payment_order_signed.send(
                 sender=request.user, payment_order=obj)
 
@@ -159,6 +159,12 @@ class PaymentOrderAdmin(AdminMixin, admin.ModelAdmin):
         obj.save()
         return super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+
+        # The items have updated the stored total
+        form.instance.refresh_from_db(fields=['total'])
+
 
 @admin.register(Payment)
 class PaymentAdmin(AdminMixin, admin.ModelAdmin):
@@ -0,0 +1,82 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .gateway import get_gateway, set_payment_intent_status
+from .models import PaymentOrder, PayMongoEvent
+from .signals import (
+    online_payment_successful,
+    online_payment_failed,
+    online_payment_refunded
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def handle_paymongo_event(event: PayMongoEvent, payment_order: PaymentOrder,
+                          payment_intent=None):
+    if event.type == 'payment.failed':
+        online_payment_failed.send(
+            sender=None, payment_order=payment_order)
+
+    elif event.type == 'payment.paid':
+        if not payment_order.paid:
+            online_payment_successful.send(
+                sender=None,
+                payment_order=payment_order,
+                payment_intent=payment_intent
+            )
+
+    elif event.type == 'payment.refunded':
+        if payment_order.paid:
+            online_payment_refunded.send(
+                sender=None, payment_order=payment_order)
+
+
+def process_paymongo_events(payment_intent_id):
+    """
+    Handle the pending webhook events of a payment intent, in the order they
+    were received.
+
+    The payment intent is retrieved before anything is locked, so a slow
+    PayMongo API never holds the rows. The payment order is then locked
+    while its events are handled, so the events of one order never run
+    concurrently, and each event is marked as processed in the same
+    transaction, so a retry picks up where it failed. The events of an
+    unknown payment intent are left pending, for `replay_paymongo_events
+    --pending` to process them again.
+    """
+    pending = PayMongoEvent.objects.filter(
+        payment_intent_id=payment_intent_id, processed_at__isnull=True)
+    # The events received from now on are handled by their own run
+    pending_ids = list(pending.values_list('id', flat=True))
+    if not pending_ids:
+        return
+    if not PaymentOrder.objects.filter(payment_intent_id=payment_intent_id).exists():
+        logger.warning('No payment order has the payment intent %s.',
+                       payment_intent_id)
+        return
+
+    payment_intent = None
+    if pending.filter(id__in=pending_ids, type='payment.paid').exists():
+        payment_intent = get_gateway().retrieve_payment_intent(
+            payment_intent_id)
+        set_payment_intent_status(payment_intent.id, payment_intent.status)
+
+    with transaction.atomic():
+        payment_order = PaymentOrder.objects.select_for_update() \
+            .filter(payment_intent_id=payment_intent_id) \
+            .first()
+        if payment_order is None:
+            return
+        events = pending.select_for_update() \
+            .filter(id__in=pending_ids) \
+            .order_by('id')
+
+        for event in events:
+            payment_order.refresh_from_db()
+            handle_paymongo_event(event, payment_order, payment_intent)
+            event.processed_at = timezone.now()
+            event.save(update_fields=['processed_at'])
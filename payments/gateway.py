@@ -0,0 +1,138 @@
+import base64
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from paymongo import (
+    ApiResource,
+    PaymongoClient,
+    PaymentIntentEntity,
+    PaymentMethodEntity
+)
+
+
+# Bump when the cached values change shape, so the old ones are ignored
+PAYMENT_INTENT_CACHE_VERSION = 1
+
+# A final status is kept longer than one that can still change
+PAYMENT_INTENT_STATUS_TIMEOUT = 5
+PAYMENT_INTENT_FINAL_STATUS_TIMEOUT = 300
+PAYMENT_INTENT_FINAL_STATUSES = ['succeeded']
+
+# How long a retrieve holds the lock
+PAYMENT_INTENT_LOCK_TIMEOUT = 15
+
+# What the others are told while the status is being retrieved
+PAYMENT_INTENT_PENDING_STATUS = 'processing'
+
+
+class PayMongoGateway:
+    """
+    Client of the PayMongo API over one pooled keep-alive session.
+
+    It returns the same entities as the paymongo SDK, but reuses the
+    connections between calls and never waits longer than the timeouts.
+    """
+
+    def __init__(self, secret_key, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        encoded_key = base64.b64encode((secret_key or '').encode('utf-8'))
+        self.session.headers.update({
+            'Authorization': f'Basic {encoded_key.decode("utf-8")}',
+            'Content-Type': 'application/json',
+        })
+
+        # Only the reads are retried; a retried create could charge twice
+        retry = Retry(total=2, backoff_factor=0.2, allowed_methods={'GET'},
+                      status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10,
+                              max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, path, payload=None):
+        json = None if payload is None else {'data': {'attributes': payload}}
+        response = self.session.request(
+            method, f'{self.base_url}/v1/{path}', json=json,
+            timeout=self.timeout)
+        if response.status_code != 200:
+            PaymongoClient.handle_error(response=response)
+        return ApiResource(response.json())
+
+    def create_payment_intent(self, payload):
+        return PaymentIntentEntity(
+            self.request('post', 'payment_intents', payload))
+
+    def retrieve_payment_intent(self, payment_intent_id):
+        return PaymentIntentEntity(
+            self.request('get', f'payment_intents/{payment_intent_id}'))
+
+    def attach_payment_intent(self, payment_intent_id, payload):
+        return PaymentIntentEntity(self.request(
+            'post', f'payment_intents/{payment_intent_id}/attach', payload))
+
+    def create_payment_method(self, payload):
+        return PaymentMethodEntity(
+            self.request('post', 'payment_methods', payload))
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """Return the gateway shared by the process."""
+    return PayMongoGateway(
+        secret_key=settings.PAYMONGO['SECRET_KEY'],
+        base_url=settings.PAYMONGO['API_BASE_URL'],
+        timeout=(settings.PAYMONGO['CONNECT_TIMEOUT'],
+                 settings.PAYMONGO['READ_TIMEOUT']))
+
+
+def get_payment_intent_cache_key(payment_intent_id):
+    return f'payments:payment_intent:{payment_intent_id}:status'
+
+
+def set_payment_intent_status(payment_intent_id, status):
+    timeout = PAYMENT_INTENT_FINAL_STATUS_TIMEOUT \
+        if status in PAYMENT_INTENT_FINAL_STATUSES \
+        else PAYMENT_INTENT_STATUS_TIMEOUT
+    cache.set(get_payment_intent_cache_key(payment_intent_id), status,
+              timeout=timeout, version=PAYMENT_INTENT_CACHE_VERSION)
+
+
+def get_payment_intent_status(payment_intent_id):
+    """
+    Return the status of a payment intent and, when this call had to
+    retrieve it, the retrieved payment intent (else None).
+
+    The status is read from the shared cache, which is filled by the webhook
+    and by the retrieves of every process. On a miss only one caller, in
+    any process, retrieves the payment intent, so several tabs or refreshes
+    cost a single API call. The others don't wait for it: they're told the
+    payment is still processing, and see its status on their next refresh.
+    This relies on the cache being shared (see CACHES), as a per-process
+    cache would neither see the webhook's status nor the lock.
+    """
+    key = get_payment_intent_cache_key(payment_intent_id)
+    status = cache.get(key, version=PAYMENT_INTENT_CACHE_VERSION)
+    if status is not None:
+        return status, None
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, timeout=PAYMENT_INTENT_LOCK_TIMEOUT,
+                 version=PAYMENT_INTENT_CACHE_VERSION):
+        try:
+            payment_intent = get_gateway().retrieve_payment_intent(
+                payment_intent_id)
+            set_payment_intent_status(payment_intent_id, payment_intent.status)
+        finally:
+            cache.delete(lock_key, version=PAYMENT_INTENT_CACHE_VERSION)
+        return payment_intent.status, payment_intent
+
+    return PAYMENT_INTENT_PENDING_STATUS, None
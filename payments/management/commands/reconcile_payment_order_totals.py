@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from payments.models import PaymentOrder, PaymentOrderItem
+
+
+class Command(BaseCommand):
+    help = ('Compare the stored totals of the payment orders with the sums '
+            'of their items, and fix the ones that drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the drifted totals, without fixing them.')
+
+    def handle(self, *args, **options):
+        sums = dict(PaymentOrderItem.objects
+                    .values('payment_order')
+                    .annotate(total=Sum('amount'))
+                    .order_by()
+                    .values_list('payment_order', 'total'))
+
+        drifted = []
+        for payment_order in PaymentOrder.objects.only('id', 'no', 'total'):
+            total = sums.get(payment_order.id) or Decimal('0.0')
+            if payment_order.total != total:
+                self.stdout.write(
+                    f'{payment_order.no}: stored {payment_order.total}, '
+                    f'items {total}')
+                payment_order.total = total
+                drifted.append(payment_order)
+
+        if drifted and not options['dry_run']:
+            PaymentOrder.objects.bulk_update(
+                drifted, ['total'], batch_size=500)
+
+        action = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {len(drifted)} drifted payment order totals.'))
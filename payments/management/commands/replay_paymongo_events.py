@@ -0,0 +1,101 @@
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from payments.models import PayMongoEvent
+from payments.tasks import process_paymongo_events
+from users.outbox import enqueue
+
+
+class Command(BaseCommand):
+    help = ('Replay captured PayMongo webhook events against the webhook, '
+            'from a JSON file or from the event ledger.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', nargs='?',
+            help='JSON file with a list of webhook payloads. When omitted, '
+                 'the payloads in the event ledger are replayed.')
+        parser.add_argument(
+            '--url', default='http://localhost:8000/payments/webhook/',
+            help='URL of the webhook.')
+        parser.add_argument(
+            '--repeat', type=int, default=1,
+            help='Number of times to send every event.')
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Maximum requests per second (0 for no limit).')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Number of requests in flight.')
+        parser.add_argument(
+            '--new-ids', action='store_true',
+            help='Give every sent event its own id, so none is deduplicated.')
+        parser.add_argument(
+            '--pending', action='store_true',
+            help='Process the events of the ledger that are still pending '
+                 '(e.g. of a payment intent no order had yet) again, '
+                 'instead of sending anything.')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            payment_intent_ids = set(PayMongoEvent.objects
+                                     .filter(processed_at__isnull=True)
+                                     .values_list('payment_intent_id', flat=True))
+            for payment_intent_id in payment_intent_ids:
+                enqueue(process_paymongo_events,
+                        payment_intent_id=payment_intent_id)
+            self.stdout.write(self.style.SUCCESS(
+                f'Queued the pending events of {len(payment_intent_ids)} '
+                f'payment intents.'))
+            return
+
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as file:
+                payloads = json.load(file)
+        else:
+            payloads = list(PayMongoEvent.objects
+                            .order_by('id')
+                            .values_list('payload', flat=True))
+
+        payloads = [payload
+                    for _ in range(options['repeat'])
+                    for payload in payloads]
+        if options['new_ids']:
+            for i, payload in enumerate(payloads):
+                payload = json.loads(json.dumps(payload))
+                payload['data']['id'] = f"{payload['data']['id']}-replay-{i}"
+                payloads[i] = payload
+
+        interval = 1 / options['rate'] if options['rate'] else 0
+
+        def send(payload):
+            request = urllib.request.Request(
+                options['url'], data=json.dumps(payload).encode('utf-8'),
+                headers={'Content-Type': 'application/json'}, method='POST')
+            started = time.monotonic()
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, time.monotonic() - started
+
+        started = time.monotonic()
+        futures = []
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for i, payload in enumerate(payloads):
+                if interval:
+                    delay = started + i * interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                futures.append(executor.submit(send, payload))
+        results = [future.result() for future in futures]
+        elapsed = time.monotonic() - started
+
+        failed = sum(1 for status, _ in results if status != 200)
+        latencies = sorted(latency for _, latency in results)
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {len(results)} events in {elapsed:.2f}s '
+            f'({len(results) / elapsed if elapsed else 0:.1f}/s), '
+            f'{failed} failed, p95 latency {p95 * 1000:.0f}ms.'))
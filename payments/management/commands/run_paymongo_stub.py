@@ -0,0 +1,235 @@
+import json
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand
+
+
+class StubGateway:
+    """In-memory payment intents and methods of the stub server."""
+
+    def __init__(self, base_url, webhook_url=None):
+        self.base_url = base_url
+        self.webhook_url = webhook_url
+        self.intents = {}
+        self.methods = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def new_id(prefix):
+        return f'{prefix}_{uuid.uuid4().hex[:24]}'
+
+    def create_intent(self, attributes):
+        now = int(time.time())
+        intent = {
+            'id': self.new_id('pi'),
+            'type': 'payment_intent',
+            'attributes': {
+                'amount': attributes.get('amount'),
+                'capture_type': 'automatic',
+                'client_key': self.new_id('pi_client'),
+                'currency': attributes.get('currency', 'PHP'),
+                'description': attributes.get('description'),
+                'last_payment_error': None,
+                'livemode': False,
+                'metadata': attributes.get('metadata'),
+                'next_action': None,
+                'payment_method_allowed': attributes.get(
+                    'payment_method_allowed', []),
+                'payment_method_options': None,
+                'payments': [],
+                'setup_future_usage': None,
+                'statement_descriptor': attributes.get('statement_descriptor'),
+                'status': 'awaiting_payment_method',
+                'created_at': now,
+                'updated_at': now
+            }
+        }
+        with self.lock:
+            self.intents[intent['id']] = intent
+        return intent
+
+    def create_method(self, attributes):
+        now = int(time.time())
+        method = {
+            'id': self.new_id('pm'),
+            'type': 'payment_method',
+            'attributes': {
+                'billing': attributes.get('billing'),
+                'details': None,
+                'livemode': False,
+                'metadata': attributes.get('metadata'),
+                'type': attributes.get('type', 'gcash'),
+                'created_at': now,
+                'updated_at': now
+            }
+        }
+        with self.lock:
+            self.methods[method['id']] = method
+        return method
+
+    def attach(self, intent_id, attributes):
+        with self.lock:
+            intent = self.intents.get(intent_id)
+            if intent is None or attributes.get('payment_method') \
+                    not in self.methods:
+                return None
+            intent['attributes']['status'] = 'awaiting_next_action'
+            intent['attributes']['next_action'] = {
+                'type': 'redirect',
+                'redirect': {
+                    'url': f'{self.base_url}/authorize/{intent_id}',
+                    'return_url': attributes.get('return_url')
+                }
+            }
+            intent['attributes']['updated_at'] = int(time.time())
+        return intent
+
+    def authorize(self, intent_id):
+        """Mark the intent as paid and return the URL to go back to."""
+        with self.lock:
+            intent = self.intents.get(intent_id)
+            if intent is None or intent['attributes']['next_action'] is None:
+                return None
+            return_url = intent['attributes']['next_action']['redirect'][
+                'return_url']
+            intent['attributes']['status'] = 'succeeded'
+            intent['attributes']['next_action'] = None
+            intent['attributes']['payments'] = [{
+                'id': self.new_id('pay'),
+                'type': 'payment',
+                'attributes': {'amount': intent['attributes']['amount']}
+            }]
+        if self.webhook_url:
+            self.send_event('payment.paid', intent_id)
+        separator = '&' if '?' in return_url else '?'
+        return f'{return_url}{separator}payment_intent_id={intent_id}'
+
+    def send_event(self, event_type, intent_id):
+        payload = {
+            'data': {
+                'id': self.new_id('evt'),
+                'type': 'event',
+                'attributes': {
+                    'type': event_type,
+                    'livemode': False,
+                    'data': {
+                        'id': self.new_id('pay'),
+                        'type': 'payment',
+                        'attributes': {'payment_intent_id': intent_id}
+                    }
+                }
+            }
+        }
+        request = urllib.request.Request(
+            self.webhook_url, data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+        except OSError:
+            pass
+
+
+def make_handler(gateway, stdout):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            stdout.write(f'{self.command} {self.path} - {format % args}')
+
+        def send_json(self, status, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def not_found(self):
+            self.send_json(404, {'errors': [{
+                'code': 'resource_not_found', 'detail': 'Not found.'}]})
+
+        def read_attributes(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(length) or b'{}')
+            return data.get('data', {}).get('attributes', {})
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            path = urlparse(self.path).path
+            match = re.fullmatch(r'/v1/payment_intents/([\w-]+)', path)
+            if match:
+                intent = gateway.intents.get(match.group(1))
+                if intent is None:
+                    return self.not_found()
+                return self.send_json(200, {'data': intent})
+
+            match = re.fullmatch(r'/authorize/([\w-]+)', path)
+            if match:
+                return_url = gateway.authorize(match.group(1))
+                if return_url is None:
+                    return self.not_found()
+                self.send_response(302)
+                self.send_header('Location', return_url)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+
+            return self.not_found()
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            path = urlparse(self.path).path
+            attributes = self.read_attributes()
+            if path == '/v1/payment_intents':
+                return self.send_json(200, {
+                    'data': gateway.create_intent(attributes)})
+            if path == '/v1/payment_methods':
+                return self.send_json(200, {
+                    'data': gateway.create_method(attributes)})
+
+            match = re.fullmatch(r'/v1/payment_intents/([\w-]+)/attach', path)
+            if match:
+                intent = gateway.attach(match.group(1), attributes)
+                if intent is None:
+                    return self.not_found()
+                return self.send_json(200, {'data': intent})
+
+            return self.not_found()
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = ('Run a local stub of the PayMongo API for tests and load runs. '
+            'Point PAYMONGO_API_BASE_URL at it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host', default='127.0.0.1',
+            help='Host to listen on.')
+        parser.add_argument(
+            '--port', type=int, default=8090,
+            help='Port to listen on.')
+        parser.add_argument(
+            '--webhook-url',
+            help='URL of the webhook to send the payment.paid events to when '
+                 'a payment is authorized.')
+
+    def handle(self, *args, **options):
+        host, port = options['host'], options['port']
+        gateway = StubGateway(f'http://{host}:{port}', options['webhook_url'])
+        server = ThreadingHTTPServer(
+            (host, port), make_handler(gateway, self.stdout))
+        self.stdout.write(f'PayMongo stub listening on http://{host}:{port}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
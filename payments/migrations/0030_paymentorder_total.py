@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:06
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_totals(apps, schema_editor):
+    PaymentOrder = apps.get_model('payments', 'PaymentOrder')
+    PaymentOrderItem = apps.get_model('payments', 'PaymentOrderItem')
+
+    total = PaymentOrderItem.objects \
+        .filter(payment_order=OuterRef('pk')) \
+        .values('payment_order') \
+        .annotate(total=Sum('amount')) \
+        .values('total')
+    PaymentOrder.objects.update(
+        total=Coalesce(Subquery(total, output_field=models.DecimalField()),
+                       Decimal('0.0')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0029_set_created_by_otc_payments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentorder',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.0'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(populate_totals,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+def populate_payment_intent_ids(apps, schema_editor):
+    PaymentOrder = apps.get_model('payments', 'PaymentOrder')
+
+    payment_orders = []
+    for payment_order in PaymentOrder.objects.filter(
+            extra_data__has_key='payment_intent_id'):
+        payment_order.payment_intent_id = \
+            payment_order.extra_data['payment_intent_id']
+        payment_orders.append(payment_order)
+    PaymentOrder.objects.bulk_update(
+        payment_orders, ['payment_intent_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0030_paymentorder_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayMongoEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('payment_intent_id', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'PayMongo Event',
+            },
+        ),
+        migrations.AddField(
+            model_name='paymentorder',
+            name='payment_intent_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.RunPython(populate_payment_intent_ids,
+                             migrations.RunPython.noop),
+    ]
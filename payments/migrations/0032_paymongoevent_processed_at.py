@@ -0,0 +1,26 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:08
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_events_as_processed(apps, schema_editor):
+    PayMongoEvent = apps.get_model('payments', 'PayMongoEvent')
+    PayMongoEvent.objects.update(processed_at=F('received_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0031_paymongo_event_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymongoevent',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_events_as_processed,
+                             migrations.RunPython.noop),
+    ]
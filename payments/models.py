@@ -1,7 +1,8 @@
 from decimal import Decimal
 
-from django.db import models
-from django.db.models import Sum
+from django.contrib.contenttypes.fields import GenericRelation
+from django.db import models, transaction
+from django.db.models import Sum, OuterRef, Subquery
 from django.db.models.functions import Coalesce
 
 from users.mixins import (
@@ -34,24 +35,59 @@ class PaymentOrder(ModelMixin, models.Model):
         related_name='approved_payment_orders', null=True)
     paid = models.BooleanField(default=False)
     extra_data = models.JSONField(default=dict)
-
-    @property
-    def total(self):
-        total = self.items.aggregate(
-            total=Coalesce(
-                Sum('amount', output_field=models.DecimalField()),
-                Decimal('0.0')
-            )
-        )['total']
-        return total
+    payment_intent_id = models.CharField(
+        max_length=100, null=True, blank=True, db_index=True, editable=False)
+    # Sum of the items' amounts, kept up to date by the items. This is done
+    # by the item model and its queryset rather than by a database trigger,
+    # so a raw SQL change of the items bypasses it; the
+    # reconcile_payment_order_totals command fixes such drift
+    total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.0'),
+        editable=False)
+    signature_set = GenericRelation('permits.Signature')
+
+    @staticmethod
+    def update_totals(payment_order_ids):
+        """Recompute the stored totals of the payment orders with one UPDATE."""
+        payment_order_ids = {payment_order_id
+                             for payment_order_id in payment_order_ids
+                             if payment_order_id is not None}
+        if not payment_order_ids:
+            return
+        total = PaymentOrderItem.objects \
+            .filter(payment_order=OuterRef('pk')) \
+            .values('payment_order') \
+            .annotate(total=Sum('amount')) \
+            .values('total')
+        PaymentOrder.objects.filter(id__in=payment_order_ids).update(
+            total=Coalesce(Subquery(total, output_field=models.DecimalField()),
+                           Decimal('0.0')))
+
+    def save(self, *args, **kwargs):
+        # The total is only written by the items, so a stale instance never
+        # overwrites it
+        if not self._state.adding and not kwargs.get('force_insert') \
+                and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'total']
+        super().save(*args, **kwargs)
+
+    def get_signature_of(self, person_id):
+        """Return the signature of the person, reading the prefetched
+        signatures when there are."""
+        for sign in self.signatures:
+            if sign.person_id == person_id:
+                return sign
+        return None
 
     @property
     def prepared_by_signature(self):
-        return self.signatures.filter(object_id=self.id, person=self.prepared_by).first()
+        return self.get_signature_of(self.prepared_by_id)
 
     @property
     def approved_by_signature(self):
-        return self.signatures.filter(object_id=self.id, person=self.approved_by).first()
+        return self.get_signature_of(self.approved_by_id)
 
     @property
     def ready(self):
@@ -61,6 +97,48 @@ class PaymentOrder(ModelMixin, models.Model):
         return str(self.no)
 
 
+class PaymentOrderItemQuerySet(models.QuerySet):
+    """Keeps the totals of the payment orders up to date on bulk changes."""
+
+    def _payment_order_ids(self):
+        return set(self.values_list('payment_order', flat=True))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            PaymentOrder.update_totals(obj.payment_order_id for obj in objs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        ids = {obj.pk for obj in objs}
+        with transaction.atomic(using=self.db):
+            # The items may be moved away from their previous payment orders
+            payment_order_ids = self.model.objects \
+                .filter(pk__in=ids)._payment_order_ids()
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            PaymentOrder.update_totals(
+                payment_order_ids | {obj.payment_order_id for obj in objs})
+        return rows
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            payment_order_ids = self._payment_order_ids()
+            rows = super().update(**kwargs)
+            payment_order = kwargs.get(
+                'payment_order', kwargs.get('payment_order_id'))
+            payment_order_ids.add(getattr(payment_order, 'pk', payment_order))
+            PaymentOrder.update_totals(payment_order_ids)
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            payment_order_ids = self._payment_order_ids()
+            deleted = super().delete()
+            PaymentOrder.update_totals(payment_order_ids)
+        return deleted
+
+
 class PaymentOrderItem(models.Model):
     payment_order = models.ForeignKey(
         PaymentOrder, on_delete=models.CASCADE, related_name='items')
@@ -69,9 +147,29 @@ class PaymentOrderItem(models.Model):
     amount = models.DecimalField(
         max_digits=10, decimal_places=2, validators=[validate_amount])
 
+    objects = PaymentOrderItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Payment Order Item"
 
+    def save(self, *args, **kwargs):
+        previous_payment_order_id = None
+        if self.pk is not None:
+            previous_payment_order_id = PaymentOrderItem.objects \
+                .filter(pk=self.pk) \
+                .values_list('payment_order', flat=True) \
+                .first()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            PaymentOrder.update_totals(
+                [previous_payment_order_id, self.payment_order_id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            PaymentOrder.update_totals([self.payment_order_id])
+        return deleted
+
 
 class PaymentType(models.TextChoices):
     OTC = 'OTC', 'On the counter'
@@ -97,3 +195,21 @@ class Payment(ModelMixin, models.Model):
 
     def __str__(self):
         return str(self.receipt_no)
+
+
+class PayMongoEvent(models.Model):
+    """Ledger of the received PayMongo webhook events, so each is handled
+    once."""
+    event_id = models.CharField(max_length=100, unique=True)
+    type = models.CharField(max_length=100)
+    payment_intent_id = models.CharField(
+        max_length=100, null=True, blank=True, db_index=True)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "PayMongo Event"
+
+    def __str__(self):
+        return str(self.event_id)
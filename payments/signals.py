@@ -3,15 +3,12 @@ import logging
 from django.dispatch import receiver
 from django.dispatch import Signal
 from django.db import transaction
-from django.contrib.admin.models import LogEntry, CHANGE
-from django.contrib.contenttypes.models import ContentType
-from django.utils.translation import gettext as _
 from django.urls import reverse_lazy
 
+from users.audit import log_change
+from users.outbox import enqueue
 from users.models import User, Notification
 
-from permits.models import PermitApplication
-
 from .models import (
     PaymentOrder,
     Payment,
@@ -43,79 +40,56 @@ online_payment_refunded = Signal()
 def receive_payment_order_prepared(sender, payment_order: PaymentOrder, **kwargs):
     message = f'Payment order {payment_order.no} has been prepared.'
     logger.info(message)
-    notify_signatories_about_prepared_payment_order.delay(
-        payment_order_id=payment_order.id)
+    enqueue(notify_signatories_about_prepared_payment_order,
+            payment_order_id=payment_order.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=payment_order.permit_application.id,
-            object_repr=_(str(payment_order.permit_application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, payment_order.permit_application, message)
 
 
 @receiver(payment_order_signed)
 def receive_payment_order_signed(sender, payment_order: PaymentOrder, **kwargs):
     message = f'Payment order {payment_order.no} has been signed.'
     logger.info(message)
-    notify_admins_about_signed_payment_order.delay(
-        payment_order_id=payment_order.id)
+    enqueue(notify_admins_about_signed_payment_order,
+            payment_order_id=payment_order.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=payment_order.permit_application.id,
-            object_repr=_(str(payment_order.permit_application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, payment_order.permit_application, message)
 
 
 @receiver(payment_order_released)
 def receive_payment_order_released(sender, payment_order: PaymentOrder, **kwargs):
     message = f'Payment order {payment_order.no} has been released.'
     logger.info(message)
-    notify_client_about_released_payment_order.delay(
-        payment_order_id=payment_order.id)
+    enqueue(notify_client_about_released_payment_order,
+            payment_order_id=payment_order.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=payment_order.permit_application.id,
-            object_repr=_(str(payment_order.permit_application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, payment_order.permit_application, message)
 
 
 @receiver(payment_order_paid)
 def receive_payment_order_paid(sender, payment_order: PaymentOrder, **kwargs):
     message = f'Payment order {payment_order.no} has been paid.'
     logger.info(message)
-    notify_client_about_paid_payment_order.delay(
-        payment_order_id=payment_order.id)
+    enqueue(notify_client_about_paid_payment_order,
+            payment_order_id=payment_order.id)
 
-    content_type = ContentType.objects.get_for_model(PermitApplication)
-    LogEntry.objects.log_action(
-        user_id=payment_order.client.id,
-        content_type_id=content_type.id,
-        object_id=payment_order.permit_application.id,
-        object_repr=_(str(payment_order.permit_application)),
-        action_flag=CHANGE,
-        change_message=_(message)
-    )
+    log_change(payment_order.client_id, payment_order.permit_application,
+               message)
 
 
 @receiver(online_payment_successful)
 def receive_online_payment_successful(sender, payment_order: PaymentOrder, payment_intent, **kwargs):
-    message = f'Payment order {payment_order.no} has been paid online.'
-    logger.info(message)
     with transaction.atomic():
+        # Lock the order, so the webhook racing the authorization page or a
+        # replayed event pays it only once
+        payment_order = PaymentOrder.objects.select_for_update() \
+            .get(pk=payment_order.pk)
+        if payment_order.paid:
+            logger.info('Payment order %s was paid already.', payment_order.no)
+            return
+
+        message = f'Payment order {payment_order.no} has been paid online.'
+        logger.info(message)
         if not hasattr(payment_order, 'payment'):
             Payment.objects.create(
                 receipt_no=payment_order.no,
@@ -130,36 +104,22 @@ def receive_online_payment_successful(sender, payment_order: PaymentOrder, payme
         payment_order.paid = True
         payment_order.save()
 
-        transaction.on_commit(
-            lambda: notify_client_about_paid_payment_order.delay(
-                payment_order_id=payment_order.id))
-
-    content_type = ContentType.objects.get_for_model(PermitApplication)
-    LogEntry.objects.log_action(
-        user_id=payment_order.client.id,
-        content_type_id=content_type.id,
-        object_id=payment_order.permit_application.id,
-        object_repr=_(str(payment_order.permit_application)),
-        action_flag=CHANGE,
-        change_message=_(message)
-    )
+        enqueue(notify_client_about_paid_payment_order,
+                dedup_key=f'online_payment_successful:{payment_intent.id}',
+                payment_order_id=payment_order.id)
+        log_change(payment_order.client_id, payment_order.permit_application,
+                   message)
 
 
 @receiver(online_payment_failed)
 def receive_online_payment_failed(sender, payment_order: PaymentOrder, **kwargs):
     message = f'Payment order {payment_order.no} was not paid successfully online.'
     logger.info(message)
-    notify_client_about_failed_payment.delay(payment_order_id=payment_order.id)
+    enqueue(notify_client_about_failed_payment,
+            payment_order_id=payment_order.id)
 
-    content_type = ContentType.objects.get_for_model(PermitApplication)
-    LogEntry.objects.log_action(
-        user_id=payment_order.client.id,
-        content_type_id=content_type.id,
-        object_id=payment_order.permit_application.id,
-        object_repr=_(str(payment_order.permit_application)),
-        action_flag=CHANGE,
-        change_message=_(message)
-    )
+    log_change(payment_order.client_id, payment_order.permit_application,
+               message)
 
 
 @receiver(online_payment_refunded)
@@ -172,16 +132,7 @@ def receive_online_payment_refunded(sender, payment_order: PaymentOrder, **kwarg
         if hasattr(payment_order, 'payment'):
             payment_order.payment.delete()
 
-        transaction.on_commit(
-            lambda: notify_client_about_refunded_payment.delay(
-                payment_order_id=payment_order.id))
-
-    content_type = ContentType.objects.get_for_model(PermitApplication)
-    LogEntry.objects.log_action(
-        user_id=payment_order.client.id,
-        content_type_id=content_type.id,
-        object_id=payment_order.permit_application.id,
-        object_repr=_(str(payment_order.permit_application)),
-        action_flag=CHANGE,
-        change_message=_(message)
-    )
+        enqueue(notify_client_about_refunded_payment,
+                payment_order_id=payment_order.id)
+        log_change(payment_order.client_id, payment_order.permit_application,
+                   message)
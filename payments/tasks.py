@@ -32,16 +32,14 @@ def get_paymentorder_signatories_who_can_receive_emails():
 def notify_signatories_about_prepared_payment_order(payment_order_id):
     payment_order = PaymentOrder.objects.get(id=payment_order_id)
     signatories = get_paymentorder_signatories_who_can_receive_emails()
-    for signatory in signatories:
-        PreparedPaymentOrderEmailView(signatory, payment_order).send()
+    PreparedPaymentOrderEmailView.send_batch(signatories, payment_order)
 
 
 @shared_task
 def notify_admins_about_signed_payment_order(payment_order_id):
     payment_order = PaymentOrder.objects.get(id=payment_order_id)
     admins = get_admins_who_can_receive_emails()
-    for admin in admins:
-        SignedPaymentOrderEmailView(admin, payment_order).send()
+    SignedPaymentOrderEmailView.send_batch(admins, payment_order)
 
 
 @shared_task
@@ -56,8 +54,7 @@ def notify_client_about_paid_payment_order(payment_order_id):
     payment_order = PaymentOrder.objects.get(id=payment_order_id)
     users = list(get_admins_who_can_receive_emails())
     users.append(payment_order.permit_application.client)
-    for user in users:
-        PaidPaymentOrderEmailView(user, payment_order).send()
+    PaidPaymentOrderEmailView.send_batch(users, payment_order)
 
 
 @shared_task
@@ -70,3 +67,10 @@ def notify_client_about_failed_payment(payment_order_id):
 def notify_client_about_refunded_payment(payment_order_id):
     payment_order = PaymentOrder.objects.get(id=payment_order_id)
     RefundedPaymentOrderEmailView(payment_order.client, payment_order).send()
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=8)
+def process_paymongo_events(payment_intent_id):
+    from .events import process_paymongo_events as process
+
+    process(payment_intent_id)
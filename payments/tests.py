@@ -1,3 +1,88 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import Client
+
+from .models import PaymentOrder, PaymentOrderItem
+
+
+class PaymentOrderTotalTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = Client.objects.create(
+            username='client', email='client@example.com')
+
+    def create_order(self, no):
+        return PaymentOrder.objects.create(
+            no=no, nature_of_doc_being_secured='Wildlife',
+            client=self.client_user)
+
+    def create_item(self, payment_order, amount):
+        return PaymentOrderItem(
+            payment_order=payment_order, legal_basis='Basis',
+            description='Fee', amount=amount)
+
+    def assertTotal(self, payment_order, total):
+        payment_order.refresh_from_db(fields=['total'])
+        self.assertEqual(payment_order.total, Decimal(total))
+
+    def test_save_and_delete(self):
+        order = self.create_order('PO-1')
+        item = self.create_item(order, 100)
+        item.save()
+        self.assertTotal(order, '100')
+
+        item.amount = 150
+        item.save()
+        self.assertTotal(order, '150')
+
+        item.delete()
+        self.assertTotal(order, '0')
+
+    def test_bulk_create(self):
+        order = self.create_order('PO-1')
+        PaymentOrderItem.objects.bulk_create(
+            [self.create_item(order, 100), self.create_item(order, 50)])
+        self.assertTotal(order, '150')
+
+    def test_update(self):
+        order = self.create_order('PO-1')
+        other = self.create_order('PO-2')
+        PaymentOrderItem.objects.bulk_create(
+            [self.create_item(order, 100), self.create_item(order, 50)])
+
+        PaymentOrderItem.objects.filter(amount=100).update(amount=200)
+        self.assertTotal(order, '250')
+
+        PaymentOrderItem.objects.filter(amount=50).update(payment_order=other)
+        self.assertTotal(order, '200')
+        self.assertTotal(other, '50')
+
+    def test_bulk_update(self):
+        order = self.create_order('PO-1')
+        PaymentOrderItem.objects.bulk_create(
+            [self.create_item(order, 100), self.create_item(order, 50)])
+        items = list(PaymentOrderItem.objects.filter(payment_order=order))
+        for item in items:
+            item.amount = 10
+        PaymentOrderItem.objects.bulk_update(items, ['amount'])
+        self.assertTotal(order, '20')
+
+    def test_delete(self):
+        order = self.create_order('PO-1')
+        PaymentOrderItem.objects.bulk_create(
+            [self.create_item(order, 100), self.create_item(order, 50)])
+        PaymentOrderItem.objects.filter(amount=100).delete()
+        self.assertTotal(order, '50')
+
+    def test_stale_order_keeps_the_total(self):
+        order = self.create_order('PO-1')
+        stale = PaymentOrder.objects.get(pk=order.pk)
+        self.create_item(order, 100).save()
+
+        stale.paid = True
+        with self.assertNumQueries(1):
+            stale.save()
+        self.assertTotal(order, '100')
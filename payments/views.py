@@ -3,28 +3,43 @@ import logging
 from django.views.generic import RedirectView
 from django.views.generic.detail import SingleObjectMixin, DetailView
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse_lazy
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-import paymongo
-
 from biodiversity.context_processors import custom_global_vars
 
 from users.views import CustomLoginRequiredMixin
 from users.models import Client
+from users.outbox import enqueue
 
-from .models import PaymentOrder
-from .signals import (
-    online_payment_successful,
-    online_payment_failed,
-    online_payment_refunded
+from .gateway import (
+    get_gateway,
+    get_payment_intent_status,
+    set_payment_intent_status
 )
+from .models import PaymentOrder, PayMongoEvent
+from .signals import online_payment_successful
+from .tasks import process_paymongo_events
 
 
 logger = logging.getLogger(__name__)
 
+# The statuses of a payment intent that can still be used for its order
+REUSABLE_INTENT_STATUSES = [
+    'awaiting_payment_method',
+    'awaiting_next_action',
+    'succeeded'
+]
+
+# The status of the payment intent after each webhook event
+EVENT_PAYMENT_INTENT_STATUSES = {
+    'payment.paid': 'succeeded',
+    'payment.failed': 'awaiting_payment_method'
+}
+
 
 class PayViaGcashRedirectView(CustomLoginRequiredMixin, SingleObjectMixin, RedirectView):
     model = PaymentOrder
@@ -40,23 +55,45 @@ class PayViaGcashRedirectView(CustomLoginRequiredMixin, SingleObjectMixin, Redir
 
         if payment_order.paid:
             return reverse_lazy(
-                'update_application', args=[payment_order.permi_application.id])
+                'update_application', args=[payment_order.permit_application.id])
+
+        gateway = get_gateway()
+        amount = int(str(payment_order.total).replace('.', ''))
+        domain = custom_global_vars(self.request)['DOMAIN']
+        return_url = domain+reverse_lazy(
+            'authorization_complete', args=[payment_order.id])
+
+        # Reuse the payment intent of an earlier click while it's still valid
+        # for the same amount, so a repeated click is a single round trip
+        payment_intent = None
+        if payment_order.payment_intent_id:
+            payment_intent = gateway.retrieve_payment_intent(
+                payment_order.payment_intent_id)
+            if payment_intent.amount != amount or \
+                    payment_intent.status not in REUSABLE_INTENT_STATUSES:
+                payment_intent = None
+            elif payment_intent.status == 'succeeded':
+                return f'{return_url}?payment_intent_id={payment_intent.id}'
+            elif payment_intent.status == 'awaiting_next_action' and \
+                    payment_intent.next_action:
+                return payment_intent.next_action['redirect']['url']
 
         # Create the payment intent
-        paymongo.api_key = settings.PAYMONGO['SECRET_KEY']
-        payload = {
-            'amount': int(str(payment_order.total).replace('.', '')),
-            'currency': 'PHP',
-            'payment_method_allowed': ['gcash'],
-            'statement_descriptor': settings.PAYMONGO['STATEMENT_DESCRIPTOR'],
-            'description': f'Payment Order #{payment_order.no} for {payment_order.permit_application.get_permit_type_display()} application.',
-            'metadata': {
-                'or_no': payment_order.no
+        if payment_intent is None:
+            payload = {
+                'amount': amount,
+                'currency': 'PHP',
+                'payment_method_allowed': ['gcash'],
+                'statement_descriptor': settings.PAYMONGO['STATEMENT_DESCRIPTOR'],
+                'description': f'Payment Order #{payment_order.no} for {payment_order.permit_application.get_permit_type_display()} application.',
+                'metadata': {
+                    'or_no': payment_order.no
+                }
             }
-        }
-        payment_intent = paymongo.PaymentIntent.create(payload)
-        payment_order.extra_data['payment_intent_id'] = payment_intent.id
-        payment_order.save()
+            payment_intent = gateway.create_payment_intent(payload)
+            payment_order.extra_data['payment_intent_id'] = payment_intent.id
+            payment_order.payment_intent_id = payment_intent.id
+            payment_order.save()
 
         # Create the payment method
         client: Client = self.request.user.subclass
@@ -68,20 +105,18 @@ class PayViaGcashRedirectView(CustomLoginRequiredMixin, SingleObjectMixin, Redir
                 'phone': str(client.phone_number)
             }
         }
-        payment_method = paymongo.PaymentMethod.create(payload)
+        payment_method = gateway.create_payment_method(payload)
         if client.extra_data is None:
             client.extra_data = {}
         client.extra_data['payment_method_id'] = payment_method.id
+        client.save(update_fields=['extra_data'])
 
         # Attach the payment intent to the payment method
-        domain = custom_global_vars(self.request)['DOMAIN']
-        return_url = domain+reverse_lazy(
-            'authorization_complete', args=[payment_order.id])
         payload = {
             'payment_method': payment_method.id,
             'return_url': return_url
         }
-        attachment = paymongo.PaymentIntent.attach(payment_intent.id, payload)
+        attachment = gateway.attach_payment_intent(payment_intent.id, payload)
 
         return attachment.next_action['redirect']['url']
 
@@ -95,14 +130,24 @@ class AuthorizationCompleteDetailView(CustomLoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        payment_intent_id = self.request.GET['payment_intent_id']
-        payment_intent = paymongo.PaymentIntent.retrieve(payment_intent_id)
-        context['payment_intent'] = payment_intent
+        payment_order: PaymentOrder = self.object
 
-        if payment_intent.status == 'succeeded':
+        # A paid order needs no call, else the status is read from the cache
+        # and PayMongo is only asked by one of the concurrent requests
+        if payment_order.paid:
+            status, payment_intent = 'succeeded', None
+        else:
+            payment_intent_id = payment_order.payment_intent_id or \
+                self.request.GET['payment_intent_id']
+            status, payment_intent = get_payment_intent_status(
+                payment_intent_id)
+        context['payment_intent'] = {'status': status}
+
+        # When the status comes from the cache, whoever cached it pays the order
+        if payment_intent is not None and payment_intent.status == 'succeeded':
             online_payment_successful.send(
                 sender=self.request.user,
-                payment_order=self.get_object(self.get_queryset()),
+                payment_order=payment_order,
                 payment_intent=payment_intent
             )
 
@@ -115,33 +160,31 @@ def webhook(request):
     logger.info('PayMongo webhook data: %s', str(request.data))
 
     try:
-        extra_data = {
-            'payment_intent_id': request.data['data']['attributes']['data']['attributes']['payment_intent_id']
-        }
+        event_id = request.data['data']['id']
         event_type = request.data['data']['attributes']['type']
-        payment_order = PaymentOrder.objects.filter(
-            extra_data__contains=extra_data).first()
-
-        if event_type == 'payment.failed':
-            online_payment_failed.send(
-                sender=None, payment_order=payment_order)
-
-        elif event_type == 'payment.paid':
-            if not payment_order.paid:
-                payment_intent = paymongo.PaymentIntent.retrieve(
-                    payment_order.extra_data['payment_intent_id'])
-                online_payment_successful.send(
-                    sender=None,
-                    payment_order=payment_order,
-                    payment_intent=payment_intent
-                )
-
-        elif event_type == 'payment.refunded':
-            if payment_order.paid:
-                online_payment_refunded.send(
-                    sender=None, payment_order=payment_order)
-
-    except (AttributeError, KeyError) as e:
+        payment_intent_id = request.data['data']['attributes']['data']['attributes']['payment_intent_id']
+    except (KeyError, TypeError) as e:
         logging.error(f'Caught an exception: {e}')
+        return Response({'message': 'Thanks.'})
+
+    # Only record the event here; it's handled by the payments queue through
+    # the outbox, so a broker outage never fails the delivery. Replayed
+    # or concurrent deliveries of an event stop at the ledger.
+    with transaction.atomic():
+        event, created = PayMongoEvent.objects.get_or_create(
+            event_id=event_id,
+            defaults={
+                'type': event_type,
+                'payment_intent_id': payment_intent_id,
+                'payload': request.data
+            })
+        if created:
+            if event_type in EVENT_PAYMENT_INTENT_STATUSES:
+                set_payment_intent_status(
+                    payment_intent_id, EVENT_PAYMENT_INTENT_STATUSES[event_type])
+            enqueue(process_paymongo_events,
+                    payment_intent_id=payment_intent_id)
+        else:
+            logger.info('PayMongo event %s was received already.', event.event_id)
 
     return Response({'message': 'Thanks.'})
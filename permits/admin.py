@@ -12,6 +12,8 @@ from django.db import transaction
 from users.mixins import AdminMixin
 from users.models import Admin
 
+from animals.stats import refresh_transport_statistics
+
 from payments.models import (
     PaymentOrder
 )
@@ -96,6 +98,7 @@ class PermitBaseAdmin(AdminMixin, admin.ModelAdmin):
 
                 obj.status = Status.RELEASED
                 obj.save()
+                refresh_transport_statistics([obj.id])
                 self.message_user(
                     request, 'The permit has been released.', level=messages.SUCCESS)
 
@@ -197,10 +200,24 @@ class RemarksInline(admin.TabularInline):
     verbose_name_plural = 'Remarks'
 
 
+class ReadyToAcceptFilter(admin.SimpleListFilter):
+    title = 'ready to accept'
+    parameter_name = 'ready_to_accept'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Yes'), ('no', 'No'))
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.ready_to_accept(self.value() == 'yes')
+        return queryset
+
+
 @admin.register(PermitApplication)
 class PermitApplicationAdmin(AdminMixin, admin.ModelAdmin):
-    list_display = ('no', 'permit_type', 'client', 'status', 'created_at')
-    list_filter = ('permit_type', 'status',)
+    list_display = ('no', 'permit_type', 'client', 'status', 'created_at',
+                    'requirements_complete')
+    list_filter = ('permit_type', 'status', ReadyToAcceptFilter)
     search_fields = ('no', 'permit_type', 'client__first_name',
                      'client__last_name', 'status')
     autocomplete_fields = ('client',)
@@ -217,7 +234,13 @@ class PermitApplicationAdmin(AdminMixin, admin.ModelAdmin):
             qs = qs.exclude(~Q(accepted_by=request.user.subclass)
                             & Q(accepted_by__isnull=False))
 
-        return qs
+        return qs.with_requirements_complete()
+
+    def requirements_complete(self, obj):
+        return obj.requirements_complete
+
+    requirements_complete.boolean = True
+    requirements_complete.admin_order_field = 'requirements_complete'
 
     def get_readonly_fields(self, request, obj=None):
         # If obj is None, it means we are adding a new record
@@ -104,3 +104,18 @@ class PermitExpiredEmailView(BasePermitEmailView):
     subject_template_name = 'permits/emails/permit_expired/subject.txt'
     body_template_name = 'permits/emails/permit_expired/body.txt'
     html_body_template_name = 'permits/emails/permit_expired/body.html'
+
+
+class PermitsExpiredDigestEmailView(EmailContextMixin, TemplatedHTMLEmailMessageView):
+    subject_template_name = 'permits/emails/permits_expired_digest/subject.txt'
+    body_template_name = 'permits/emails/permits_expired_digest/body.txt'
+    html_body_template_name = 'permits/emails/permits_expired_digest/body.html'
+
+    def __init__(self, user, permits, *args, **kwargs):
+        super().__init__(user, *args, **kwargs)
+        self.permits = permits
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['permits'] = self.permits
+        return context
@@ -2,13 +2,8 @@ from datetime import datetime
 
 from ajax_select.fields import AutoCompleteSelectField
 
-from django.db.models import Q
 from django import forms
 
-from animals.models import (
-    SubSpecies
-)
-
 from users.models import Client
 
 from .models import (
@@ -20,12 +15,12 @@ from .models import (
     CollectionEntry,
     CollectorOrTrapper,
     WildlifeCollectorPermit,
-    PermittedToCollectAnimal,
     LocalTransportPermit,
     WildlifeFarmPermit,
     CertificateOfWildlifeRegistration,
     GratuitousPermit
 )
+from .permitted import get_permitted_species
 
 
 class TransportEntryBaseForm(forms.ModelForm):
@@ -45,10 +40,8 @@ class TransportEntryBaseForm(forms.ModelForm):
                 'This species has been chosen for transport already.')
 
         # Make sure only collected species are chosen for transport
-        allowed = SubSpecies.objects.filter(Q(species_permitted__wcp__client=application.client)
-                                            & Q(species_permitted__wcp__status=Status.RELEASED)
-                                            & Q(common_name__exact=sub_species.common_name)).first()
-        if not allowed:
+        permitted = get_permitted_species(application.client_id)
+        if not permitted.allows(sub_species):
             raise forms.ValidationError(
                 'The client is not allowed to transport this species.')
 
@@ -58,15 +51,15 @@ class TransportEntryBaseForm(forms.ModelForm):
         sub_species = self.cleaned_data.get('sub_species')
         quantity = self.cleaned_data.get('quantity')
 
-        wcp: WildlifeCollectorPermit = self.instance.permit_application.client.current_wcp
-        if wcp:
-            permitted_species: PermittedToCollectAnimal = wcp.allowed_species.filter(
-                sub_species=sub_species).first()
-            if permitted_species:
-                if quantity > permitted_species.quantity:
-                    raise forms.ValidationError(
-                        f'The client is only allowed to transport a quantity of {permitted_species.quantity} '
-                        f'for the species {sub_species}.')
+        client_id = self.instance.permit_application.client_id
+        permitted = get_permitted_species(client_id)
+        if permitted.has_wcp:
+            max_quantity = permitted.max_quantity(sub_species) \
+                if sub_species else None
+            if max_quantity is not None and quantity > max_quantity:
+                raise forms.ValidationError(
+                    f'The client is only allowed to transport a quantity of {max_quantity} '
+                    f'for the species {sub_species}.')
         else:
             raise forms.ValidationError(
                 'The client does not have a WCP yet.')
@@ -110,7 +103,7 @@ class PermitApplicationForm(forms.ModelForm):
         client: Client = self.initial.get('client')
 
         if permit_type == PermitType.LTP:
-            has_needed_permits = client.current_wcp and client.current_wfp
+            has_needed_permits = client.current_wcp_id and client.current_wfp_id
             if not has_needed_permits:
                 return forms.ValidationError(
                     "You currently don't have the needed permits WFP or WCP.")
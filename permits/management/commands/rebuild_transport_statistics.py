@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from animals.stats import rebuild_transport_statistics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the transport statistics rollup from scratch.'
+
+    def handle(self, *args, **options):
+        count = rebuild_transport_statistics()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the transport statistics with {count} rows.'))
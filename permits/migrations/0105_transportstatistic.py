@@ -0,0 +1,36 @@
+# Generated by Django 4.1.7 on 2026-10-18 14:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0032_alter_notification_read'),
+        ('animals', '0008_alter_subspecies_image'),
+        ('permits', '0104_remove_inspection_inspecting_officer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransportStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('DRAFT', 'On Draft'), ('SUBMITTED', 'Submitted'), ('RETURNED', 'Returned'), ('ACCEPTED', 'Accepted'), ('RELEASED', 'Released'), ('USED', 'Used'), ('EXPIRED', 'Expired')], max_length=50)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transport_statistics', to='users.client')),
+                ('species', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transport_statistics', to='animals.species')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='transportstatistic',
+            index=models.Index(fields=['year', 'month', 'status'], name='permits_tra_year_6f75b1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='transportstatistic',
+            unique_together={('year', 'month', 'species', 'client', 'status')},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 14:59
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_expired_permits_as_notified(apps, schema_editor):
+    Permit = apps.get_model('permits', 'Permit')
+    Permit.objects.filter(status='EXPIRED') \
+        .update(expiry_notified_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permits', '0105_transportstatistic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='permit',
+            name='expiry_notified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_expired_permits_as_notified,
+                             migrations.RunPython.noop),
+    ]
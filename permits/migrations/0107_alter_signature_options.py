@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permits', '0106_permit_expiry_notified_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='signature',
+            options={'ordering': ['id']},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+def fill_expiry_digest_sent_at(apps, schema_editor):
+    # The digest went out with the client emails until now
+    Permit = apps.get_model('permits', 'Permit')
+    Permit.objects \
+        .filter(expiry_notified_at__isnull=False) \
+        .update(expiry_digest_sent_at=models.F('expiry_notified_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permits', '0107_alter_signature_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='permit',
+            name='expiry_digest_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_expiry_digest_sent_at, migrations.RunPython.noop),
+    ]
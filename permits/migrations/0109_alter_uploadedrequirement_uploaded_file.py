@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 17:05
+
+from django.db import migrations, models
+import users.mixins
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permits', '0108_permit_expiry_digest_sent_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadedrequirement',
+            name='uploaded_file',
+            field=models.FileField(upload_to='requirements/', validators=[users.mixins.validate_file_extension, users.mixins.validate_file_size]),
+        ),
+    ]
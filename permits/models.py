@@ -4,15 +4,16 @@ import base64
 
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.urls import reverse_lazy
-from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Sum, F, Value
+from django.db.models import Sum, F, Q, Value, Case, When, Exists, OuterRef
 from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core.validators import MinValueValidator
 
-from model_utils.managers import InheritanceManager
+from model_utils.managers import InheritanceManager, InheritanceQuerySet
 
 from users.mixins import ModelMixin
 from users.mixins import (
@@ -20,7 +21,7 @@ from users.mixins import (
     validate_amount,
     validate_file_size
 )
-from animals.models import SubSpecies
+from animals.models import Species, SubSpecies
 
 
 class Status(models.TextChoices):
@@ -74,6 +75,18 @@ class RequirementItem(models.Model):
         unique_together = ('requirement_list', 'requirement')
 
 
+class PermitQuerySet(InheritanceQuerySet):
+
+    def with_current_status(self):
+        """Annotate the status the permits currently have, as `effective_status`,
+        where the ones past their validity are expired."""
+        return self.annotate(effective_status=Case(
+            When(valid_until__lt=timezone.now().date(),
+                 then=Value(Status.EXPIRED)),
+            default=F('status'),
+            output_field=models.CharField()))
+
+
 class Permit(ModelMixin, models.Model):
     permit_no = models.CharField(max_length=255, unique=True)
     status = models.CharField(choices=Status.choices, max_length=50)
@@ -95,18 +108,31 @@ class Permit(ModelMixin, models.Model):
         'Inspection', on_delete=models.SET_NULL, null=True)
     farm_name = models.CharField(max_length=255, null=True)
     farm_address = models.CharField(max_length=255, null=True)
+    expiry_notified_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    expiry_digest_sent_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    signature_set = GenericRelation('Signature')
 
-    objects = InheritanceManager()
+    objects = InheritanceManager.from_queryset(PermitQuerySet)()
 
     @property
     def current_status(self):
-        if self.valid_until:
-            is_still_valid = self.valid_until >= timezone.now().date()
-            if not is_still_valid:
-                self.status = Status.EXPIRED
-                self.save()
+        """
+        Return the status the permit currently has, which is expired when
+        it's past its validity. Nothing is saved here; expiring the permits
+        is left to the scheduled check_permit_validity task.
+        """
+        if hasattr(self, 'effective_status'):
+            return self.effective_status
+        if self.valid_until and self.valid_until < timezone.now().date():
+            return Status.EXPIRED
         return self.status
 
+    @property
+    def current_status_display(self):
+        return Status(self.current_status).label
+
     @property
     def admin_url(self):
         permit = self.subclass
@@ -237,6 +263,56 @@ class LocalTransportPermit(Permit):
             return self.or_no
 
 
+class PermitApplicationQuerySet(models.QuerySet):
+
+    def with_requirements_complete(self):
+        """Annotate whether all the required requirements of the applications
+        are uploaded, as `requirements_complete`."""
+        uploaded = UploadedRequirement.objects.filter(
+            requirement=OuterRef('requirement'),
+            permit_application=OuterRef(OuterRef('pk')))
+        missing = RequirementItem.objects \
+            .filter(requirement_list__permit_type=OuterRef('permit_type'),
+                    optional=False) \
+            .filter(~Exists(uploaded))
+        return self.annotate(requirements_complete=~Exists(missing))
+
+    def with_submittability(self):
+        """Annotate everything `submittable` needs, so the applications can be
+        evaluated without further queries."""
+        return self.with_requirements_complete().annotate(
+            has_species_to_transport=Exists(TransportEntry.objects.filter(
+                permit_application=OuterRef('pk'))),
+            has_requested_species=Exists(CollectionEntry.objects.filter(
+                permit_application=OuterRef('pk'))),
+            has_collectors_or_trappers=Exists(CollectorOrTrapper.objects.filter(
+                permit_application=OuterRef('pk'))))
+
+    def ready_to_accept(self, ready=True):
+        """Filter the applications that are (or aren't) submittable in SQL."""
+        missing_farm = Q(farm_name__isnull=True) | Q(farm_name='') \
+            | Q(farm_address__isnull=True) | Q(farm_address='')
+        incomplete = Q(requirements_complete=False) \
+            | (Q(permit_type=PermitType.LTP)
+               & (Q(has_species_to_transport=False)
+                  | Q(transport_date__isnull=True)
+                  | Q(transport_location__isnull=True)
+                  | Q(transport_location=''))) \
+            | (Q(permit_type=PermitType.WCP)
+               & (missing_farm
+                  | Q(has_requested_species=False)
+                  | Q(has_collectors_or_trappers=False))) \
+            | (Q(permit_type=PermitType.WFP) & missing_farm)
+        qs = self.with_submittability()
+        return qs.exclude(incomplete) if ready else qs.filter(incomplete)
+
+    def evaluate_submittability(self):
+        """Return the reasons why each application isn't submittable yet, by
+        id, with one query. Submittable applications have no reasons."""
+        return {application.id: application.unsubmittable_reasons
+                for application in self.with_submittability()}
+
+
 class PermitApplication(ModelMixin, models.Model):
     no = models.CharField(max_length=255)
     client = models.ForeignKey(
@@ -267,23 +343,29 @@ class PermitApplication(ModelMixin, models.Model):
         upload_to='uploaded_inspections/', null=True, blank=True,
         validators=[validate_file_size])
 
+    objects = PermitApplicationQuerySet.as_manager()
+
     @property
     def total_transport_quantity(self):
         return self.requested_species_to_transport.aggregate(
             total=Coalesce(Sum(F('quantity')), Value(0, models.IntegerField())))['total']
 
-    @property
+    @cached_property
     def needed_requirements(self):
-        needed_requirements = []
-        for needed_requirement in RequirementList.objects.get(permit_type=self.permit_type).items.all():
-            uploaded_requirement = UploadedRequirement.objects.filter(requirement=needed_requirement.requirement,
-                                                                      permit_application=self).first()
-            needed_requirements.append({
-                'requirement': needed_requirement,
-                'submitted': uploaded_requirement is not None,
-                'optional': needed_requirement.optional,
-            })
-        return needed_requirements
+        """The requirements checklist, loaded once per instance with a single
+        query."""
+        uploaded = UploadedRequirement.objects.filter(
+            requirement=OuterRef('requirement'), permit_application=self)
+        items = RequirementItem.objects \
+            .filter(requirement_list__permit_type=self.permit_type) \
+            .select_related('requirement') \
+            .annotate(submitted=Exists(uploaded)) \
+            .order_by('pk')
+        return [{
+            'requirement': item,
+            'submitted': item.submitted,
+            'optional': item.optional,
+        } for item in items]
 
     @property
     def needed_requirements_are_submitted(self):
@@ -297,39 +379,58 @@ class PermitApplication(ModelMixin, models.Model):
         return self.status in (Status.DRAFT, Status.RETURNED)
 
     @property
-    def submittable(self):
+    def unsubmittable_reasons(self):
+        """
+        Return the reasons why the application cannot be submitted yet.
+
+        The annotations of `with_submittability()` are used when the
+        application was loaded with them; otherwise each check is a query.
+        """
+        annotated = hasattr(self, 'has_species_to_transport')
+
+        def has(annotation, related_name):
+            if annotated:
+                return getattr(self, annotation)
+            return getattr(self, related_name).exists()
+
+        reasons = []
+
         # Make sure the requirements are submitted
-        if not self.needed_requirements_are_submitted:
-            return False
+        if annotated:
+            requirements_complete = self.requirements_complete
+        else:
+            requirements_complete = self.needed_requirements_are_submitted
+        if not requirements_complete:
+            reasons.append('Some requirements are not uploaded yet.')
 
         # For LTP
         if self.permit_type == PermitType.LTP:
-            if self.requested_species_to_transport.count() == 0:
-                return False
+            if not has('has_species_to_transport', 'requested_species_to_transport'):
+                reasons.append('There are no species to transport.')
             if not self.transport_date:
-                return False
+                reasons.append('The transport date is missing.')
             if not self.transport_location:
-                return False
+                reasons.append('The transport location is missing.')
+
+        # For WCP and WFP
+        if self.permit_type in (PermitType.WCP, PermitType.WFP):
+            if not self.farm_name:
+                reasons.append('The farm name is missing.')
+            if not self.farm_address:
+                reasons.append('The farm address is missing.')
 
         # For WCP
         if self.permit_type == PermitType.WCP:
-            needed_fields = ['farm_name', 'farm_address']
-            for field in needed_fields:
-                if not hasattr(self, field) or (hasattr(self, field) and not getattr(self, field)):
-                    return False
-            if self.requested_species.count() == 0:
-                return False
-            if self.collectors_or_trappers.count() == 0:
-                return False
+            if not has('has_requested_species', 'requested_species'):
+                reasons.append('There are no requested species.')
+            if not has('has_collectors_or_trappers', 'collectors_or_trappers'):
+                reasons.append('There are no collectors or trappers.')
 
-        # For WFP
-        if self.permit_type == PermitType.WFP:
-            needed_fields = ['farm_name', 'farm_address']
-            for field in needed_fields:
-                if not hasattr(self, field) or (hasattr(self, field) and not getattr(self, field)):
-                    return False
+        return reasons
 
-        return True
+    @property
+    def submittable(self):
+        return not self.unsubmittable_reasons
 
     @property
     def client_url(self):
@@ -358,6 +459,26 @@ class TransportEntry(models.Model):
         unique_together = ('sub_species', 'permit_application')
 
 
+class TransportStatistic(models.Model):
+    """Rollup of the transported quantities per month, species, client and
+    permit status."""
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    species = models.ForeignKey(
+        Species, on_delete=models.CASCADE, related_name='transport_statistics')
+    client = models.ForeignKey(
+        'users.Client', on_delete=models.CASCADE, null=True,
+        related_name='transport_statistics')
+    status = models.CharField(choices=Status.choices, max_length=50)
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('year', 'month', 'species', 'client', 'status')
+        indexes = [
+            models.Index(fields=['year', 'month', 'status']),
+        ]
+
+
 class CollectionEntry(models.Model):
     sub_species = models.ForeignKey(
         SubSpecies, on_delete=models.CASCADE, related_name='collections',
@@ -412,6 +533,7 @@ class Inspection(ModelMixin, models.Model):
         PermitApplication, on_delete=models.CASCADE,
         null=True)
     scheduled_date = models.DateField(null=True)
+    signature_set = GenericRelation('Signature')
 
     @property
     def day(self):
@@ -470,6 +592,7 @@ class Signature(models.Model):
         'users.User', on_delete=models.CASCADE, blank=True, null=True)
 
     class Meta:
+        ordering = ['id']
         indexes = [
             models.Index(fields=["content_type", "object_id"]),
         ]
@@ -482,13 +605,34 @@ class Signature(models.Model):
         elif user.title and user.signature_image:
             sign = Signature(person=user, content_object=obj)
             sign.save()
+            Signature.forget_prefetched(obj)
             return sign
 
     @staticmethod
     def remove(user, obj):
         for sign in obj.signatures:
-            if sign.person == user:
+            if sign.person_id == user.id:
                 sign.delete()
+        Signature.forget_prefetched(obj)
+
+    @staticmethod
+    def prefetch(objects):
+        """
+        Load the signatures, with their signers, of the given permits,
+        inspections or payment orders with one query per model.
+        """
+        objects_per_model = {}
+        for obj in objects:
+            if hasattr(type(obj), 'signature_set'):
+                objects_per_model.setdefault(type(obj), []).append(obj)
+        for model_objects in objects_per_model.values():
+            models.prefetch_related_objects(model_objects, models.Prefetch(
+                'signature_set',
+                queryset=Signature.objects.select_related('person')))
+
+    @staticmethod
+    def forget_prefetched(obj):
+        getattr(obj, '_prefetched_objects_cache', {}).pop('signature_set', None)
 
 
 class Validation(models.Model):
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import PermittedToCollectAnimal, WildlifeCollectorPermit, Status
+
+
+# Bump when the cached values change shape, so the old ones are ignored
+PERMITTED_SPECIES_CACHE_VERSION = 1
+
+# The permits that pass their validity before they're expired are only
+# trusted for this long
+PERMITTED_SPECIES_TIMEOUT = 60 * 60
+
+
+def get_permitted_species_cache_key(client_id):
+    return f'permits:permitted_species:{client_id}'
+
+
+class PermittedSpecies:
+    """The sub species a client may collect under their released WCPs,
+    with the highest quantity permitted for each."""
+
+    def __init__(self, has_wcp, quantities, common_names):
+        self.has_wcp = has_wcp
+        self.quantities = quantities
+        self.common_names = common_names
+
+    @property
+    def ids(self):
+        return set(self.quantities)
+
+    def allows(self, sub_species):
+        # Any sub species sharing the name of a permitted one is allowed too
+        return sub_species.id in self.quantities or \
+            sub_species.common_name in self.common_names
+
+    def max_quantity(self, sub_species):
+        return self.quantities.get(sub_species.id)
+
+
+def get_permitted_species(client_id):
+    """
+    Return the PermittedSpecies of a client.
+
+    They're read from the database the first time and cached until one of
+    the client's permits or permitted species changes.
+    """
+    key = get_permitted_species_cache_key(client_id)
+    value = cache.get(key, version=PERMITTED_SPECIES_CACHE_VERSION)
+    if value is None:
+        has_wcp = WildlifeCollectorPermit.objects \
+            .filter(client_id=client_id, status=Status.RELEASED) \
+            .exists()
+        rows = PermittedToCollectAnimal.objects \
+            .filter(wcp__client_id=client_id, wcp__status=Status.RELEASED) \
+            .values('sub_species', 'sub_species__common_name') \
+            .annotate(max_quantity=Max('quantity')) \
+            .order_by()
+        quantities = {}
+        common_names = set()
+        for row in rows:
+            quantities[row['sub_species']] = row['max_quantity']
+            common_names.add(row['sub_species__common_name'])
+        value = (has_wcp, quantities, common_names)
+        cache.set(key, value, timeout=PERMITTED_SPECIES_TIMEOUT,
+                  version=PERMITTED_SPECIES_CACHE_VERSION)
+    return PermittedSpecies(*value)
+
+
+def clear_permitted_species(client_ids):
+    cache.delete_many(
+        [get_permitted_species_cache_key(client_id)
+         for client_id in set(client_ids) if client_id is not None],
+        version=PERMITTED_SPECIES_CACHE_VERSION)
@@ -0,0 +1,336 @@
+import calendar
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import (
+    Value,
+    OuterRef,
+    Subquery,
+    Prefetch
+)
+from django.db.models.functions import Coalesce
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, Font, Border, Side, Alignment
+from openpyxl.worksheet.cell_range import CellRange
+
+from users.models import Client
+
+from animals.stats import get_client_transport_totals
+
+from .models import (
+    Status,
+    PermitApplication,
+    LocalTransportPermit,
+    TransportEntry,
+    Remarks
+)
+
+
+QUARTERS = [(1, 2, 3), (4, 5, 6), (7, 8, 9), (10, 11, 12)]
+
+center = Alignment(horizontal='center', vertical='center',
+                   wrapText=True)
+top = Alignment(horizontal='left', vertical='top',
+                wrapText=True)
+border = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"))
+header_style = NamedStyle(name='header_style')
+header_style.font = Font(bold=True)
+header_style.alignment = center
+
+
+def get_quarter_months(quarter):
+    return QUARTERS[int(quarter)-1]
+
+
+def get_report_clients():
+    """Return the clients who have LTPs."""
+    return Client.objects \
+        .filter(id__in=LocalTransportPermit.objects.values('client')) \
+        .order_by('first_name')
+
+
+def get_report_ltps(from_date, to_date):
+    """Return the LTPs created in the given dates, with everything the
+    reports need annotated or prefetched."""
+    application = PermitApplication.objects \
+        .filter(permit=OuterRef('pk')) \
+        .order_by('pk')
+    remarks = Remarks.objects \
+        .filter(permit_application=OuterRef('application_id')) \
+        .order_by('created_at') \
+        .values('content')[:1]
+    transports = TransportEntry.objects \
+        .select_related('sub_species__main_species') \
+        .order_by('sub_species__main_species', 'sub_species__common_name')
+
+    return LocalTransportPermit.objects \
+        .filter(
+            status__in=[Status.RELEASED, Status.USED],
+            created_at__gte=from_date,
+            created_at__lte=to_date) \
+        .annotate(
+            application_id=Subquery(application.values('pk')[:1]),
+            application_created_at=Subquery(
+                application.values('created_at')[:1]),
+            payment_order_total=Coalesce(
+                'payment_order__total', Value(Decimal('0.0'))),
+            first_remarks=Subquery(remarks)) \
+        .prefetch_related(Prefetch('species_to_transport', queryset=transports)) \
+        .order_by('-created_at')
+
+
+def get_quarterly_report_data(year, quarter):
+    """
+    Load the data of the quarterly reports.
+
+    Everything is read with a fixed number of queries no matter how many
+    clients or permits there are: one for the clients, one for the LTPs
+    and one for their transport entries (plus one for the rollup when it's
+    enabled). The totals are then computed in memory.
+    """
+    months = get_quarter_months(quarter)
+    first_month, _, third_month = months
+    from_date = f'{year}-{first_month:02d}-01'
+    to_date = f'{year}-{third_month:02d}-{calendar.monthrange(year, third_month)[1]}'
+
+    client_totals = None
+    if settings.TRANSPORT_STATISTICS_ROLLUP:
+        client_totals = get_client_transport_totals(year, months)
+
+    ltps_per_client = {}
+    for ltp in get_report_ltps(from_date, to_date):
+        ltps_per_client.setdefault(ltp.client_id, []).append(ltp)
+
+    data = {
+        'year': year,
+        'quarter': quarter,
+        'months': months,
+        'from_date': from_date,
+        'to_date': to_date,
+        'clients': {
+            'list': []
+        }
+    }
+    for client in get_report_clients():
+        ltps = ltps_per_client.get(client.id, [])
+        client_data = {'client': client,
+                       'farm_name': client.current_farm_name,
+                       'ltps': ltps,
+                       'permits_issued_in_month': [0, 0, 0],
+                       'total_permits': 0, 'fees_collected': 0,
+                       'total_species': 0}
+
+        # Only the LTPs for transports within the quarter are counted
+        payment_order_totals = {}
+        total_species = 0
+        for ltp in ltps:
+            transport_date = ltp.transport_date
+            if transport_date.year != year or transport_date.month not in months:
+                continue
+            client_data['permits_issued_in_month'][months.index(
+                transport_date.month)] += 1
+            client_data['total_permits'] += 1
+            if ltp.payment_order_id:
+                payment_order_totals[ltp.payment_order_id] = \
+                    ltp.payment_order_total
+            for transport in ltp.species_to_transport.all():
+                total_species += transport.quantity
+
+        client_data['fees_collected'] = float(
+            sum(payment_order_totals.values()))
+        if client_totals is not None:
+            total_species = client_totals.get(client.id, 0)
+        client_data['total_species'] = int(total_species)
+
+        data['clients']['list'].append(client_data)
+
+    return data
+
+
+def _cell(ws, value=None, style=None, alignment=None):
+    cell = WriteOnlyCell(ws, value=value)
+    if style is not None:
+        cell.style = style
+    if alignment is not None:
+        cell.alignment = alignment
+    cell.border = border
+    return cell
+
+
+def _row(ws, cells, columns):
+    """Return a bordered row of the given columns with the given cells
+    (column -> cell) in place."""
+    return [cells[column] if column in cells else _cell(ws)
+            for column in range(1, columns+1)]
+
+
+def _merge(ws, start_row, start_column, end_row, end_column):
+    ws.merged_cells.add(CellRange(
+        min_col=start_column, min_row=start_row,
+        max_col=end_column, max_row=end_row))
+
+
+def iter_clients_report_rows(ws, data):
+    """Yield the rows of the clients report."""
+    year, quarter, months = data['year'], data['quarter'], data['months']
+    first_month = calendar.month_name[months[0]]
+    second_month = calendar.month_name[months[1]]
+    third_month = calendar.month_name[months[2]]
+    title = ('Issuance of Wildlife Local Transport Permit for Quarter '
+             f'{quarter} ({first_month}-{third_month}) C.Y. - {year}')
+
+    yield _row(ws, {1: _cell(ws, title, header_style)}, 9)
+    _merge(ws, 1, 1, 1, 9)
+
+    yield _row(ws, {
+        1: _cell(ws, 'PERMITTEE', header_style),
+        2: _cell(ws, 'ADDRESS', header_style),
+        3: _cell(ws, 'BUSINESS NAME', header_style),
+        4: _cell(ws, f'NUMBER OF PERMITS ISSUED FOR QUARTER {quarter} C.Y. {year}',
+                 header_style),
+        7: _cell(ws, 'GRAND TOTAL', header_style),
+        8: _cell(ws, 'FEES COLLECTED (Php)', header_style),
+        9: _cell(ws, 'TOTAL NO. OF SPECIES TRANSPORTED', header_style),
+    }, 9)
+    _merge(ws, 2, 1, 3, 1)
+    _merge(ws, 2, 2, 3, 2)
+    _merge(ws, 2, 3, 3, 3)
+    _merge(ws, 2, 4, 2, 6)
+    _merge(ws, 2, 7, 3, 7)
+    _merge(ws, 2, 8, 3, 8)
+    _merge(ws, 2, 9, 3, 9)
+
+    yield _row(ws, {
+        4: _cell(ws, first_month.upper(), header_style),
+        5: _cell(ws, second_month.upper(), header_style),
+        6: _cell(ws, third_month.upper(), header_style),
+    }, 9)
+
+    totals = [0, 0, 0, 0, 0, 0]
+    for i in data['clients']['list']:
+        values = [*i['permits_issued_in_month'], i['total_permits'],
+                  i['fees_collected'], i['total_species']]
+        totals = [a + b for a, b in zip(totals, values)]
+        yield [
+            _cell(ws, f"{i['client'].first_name} {i['client'].last_name}"),
+            _cell(ws, i['client'].address),
+            _cell(ws, i['farm_name']),
+            *[_cell(ws, value) for value in values]
+        ]
+
+    yield _row(ws, {
+        3: _cell(ws, 'TOTAL', header_style),
+        **{column: _cell(ws, value)
+           for column, value in enumerate(totals, 4)}
+    }, 9)
+
+
+def iter_ltp_report_rows(ws, data):
+    """Yield the rows of the local transport permits report."""
+    headers = {
+        1: 'Permit Holder', 3: 'Permit Details', 8: 'Species Transported',
+        15: 'Origin', 16: 'Destination', 17: 'Purpose of Transfer',
+        18: 'Remarks'
+    }
+    yield _row(ws, {column: _cell(ws, value, header_style)
+                    for column, value in headers.items()}, 18)
+    _merge(ws, 1, 1, 1, 2)
+    _merge(ws, 1, 3, 1, 7)
+    _merge(ws, 1, 8, 1, 14)
+    for column in range(15, 19):
+        _merge(ws, 1, column, 2, column)
+
+    headers = [
+        'Name of Holder', 'Address of Holder', 'Permit No.',
+        'Date of Application', 'Issuance Date', 'Expiry Date',
+        'Fees Collected', 'Species Type', 'Common Name', 'Scientific Name',
+        'Type of Specimen', 'Quantity', 'Unit of Measurement', 'Description'
+    ]
+    yield _row(ws, {column: _cell(ws, value, header_style)
+                    for column, value in enumerate(headers, 1)}, 18)
+
+    row = 3
+    for client in data['clients']['list']:
+        client_row = row
+        for ltp in client['ltps']:
+            transports = ltp.species_to_transport.all()
+            if len(transports) == 0:
+                continue
+
+            permit_row = row
+            for transport in transports:
+                cells = {
+                    8: _cell(ws, transport.sub_species.main_species.name),
+                    9: _cell(ws, transport.sub_species.common_name),
+                    10: _cell(ws, transport.sub_species.scientific_name),
+                    11: _cell(ws, transport.description),
+                    12: _cell(ws, transport.quantity),
+                    13: _cell(ws, 'Pieces'),
+                    14: _cell(ws, transport.description),
+                    15: _cell(ws, 'Marinduque'),
+                    16: _cell(ws, ltp.transport_location),
+                    17: _cell(ws, 'Export'),
+                }
+                if ltp.first_remarks:
+                    cells[18] = _cell(ws, ltp.first_remarks)
+                if row == client_row:
+                    cells[1] = _cell(
+                        ws, f"{client['client'].first_name} {client['client'].last_name}",
+                        alignment=top)
+                    cells[2] = _cell(
+                        ws, client['client'].address, alignment=top)
+                if row == permit_row:
+                    cells[3] = _cell(ws, ltp.permit_no, alignment=top)
+                    if ltp.application_id:
+                        cells[4] = _cell(
+                            ws, ltp.application_created_at.date(),
+                            alignment=top)
+                    cells[5] = _cell(ws, ltp.issued_date, alignment=top)
+                    cells[6] = _cell(ws, ltp.valid_until, alignment=top)
+                    if ltp.payment_order_id:
+                        cells[7] = _cell(
+                            ws, ltp.payment_order_total, alignment=top)
+                yield _row(ws, cells, 18)
+                row += 1
+
+            for column in range(3, 8):
+                _merge(ws, permit_row, column, row-1, column)
+
+        if row > client_row:
+            _merge(ws, client_row, 1, row-1, 1)
+            _merge(ws, client_row, 2, row-1, 2)
+
+
+def write_quarterly_reports(data, file):
+    """
+    Write the quarterly reports workbook into the given file.
+
+    The workbook is in write-only mode, so each row is styled as it's
+    produced and streamed out instead of keeping every cell in memory.
+    """
+    wb = Workbook(write_only=True)
+    wb.add_named_style(header_style)
+
+    clients_sheet = wb.create_sheet('Clients')
+    for column in 'abc':
+        clients_sheet.column_dimensions[column].width = 20
+    for column in 'defh':
+        clients_sheet.column_dimensions[column].width = 15
+    clients_sheet.column_dimensions['i'].width = 20
+    for row in iter_clients_report_rows(clients_sheet, data):
+        clients_sheet.append(row)
+
+    ltp_sheet = wb.create_sheet('Local Transport Permits')
+    for column in 'abcdefghijklmnopqr':
+        ltp_sheet.column_dimensions[column].width = 20
+    ltp_sheet.column_dimensions['c'].width = 25
+    for row in iter_ltp_report_rows(ltp_sheet, data):
+        ltp_sheet.append(row)
+
+    wb.save(file)
@@ -1,18 +1,32 @@
 import logging
+from functools import partial
 
 from django.dispatch import receiver
 from django.dispatch import Signal
-from django.contrib.admin.models import LogEntry, CHANGE
-from django.contrib.contenttypes.models import ContentType
-from django.utils.translation import gettext as _
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.urls import reverse_lazy
 
-from users.models import User, Notification
+from users.audit import log_change
+from users.outbox import enqueue
+from users.models import User, Client
+from users.notifications import send_notifications
+
+from animals.stats import (
+    get_transport_statistic_slices,
+    refresh_transport_statistics_on_commit
+)
 
 from .models import (
     PermitApplication,
-    Permit
+    Permit,
+    LocalTransportPermit,
+    PermittedToCollectAnimal,
+    TransportEntry,
+    WildlifeCollectorPermit,
+    WildlifeFarmPermit
 )
+from .permitted import clear_permitted_species
 from .tasks import (
     notify_admins_about_submitted_application,
     notify_admins_about_unsubmitted_application,
@@ -49,18 +63,10 @@ permit_expired = Signal()
 def receive_application_submitted(sender, application: PermitApplication, **kwargs):
     message = f'Permit application {application.no} has been submitted.'
     logger.info(message)
-    notify_admins_about_submitted_application.delay(
-        application_id=application.id)
+    enqueue(notify_admins_about_submitted_application,
+            application_id=application.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=application.id,
-            object_repr=_(str(application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, application, message)
 
 
 @receiver(application_submitted)
@@ -71,30 +77,20 @@ def create_notifications_for_application_submitted(
     A permit application for type {application.get_permit_type_display()} with
     number {application.no} has been submitted by {application.client.name}.
     """
-    admins = get_admins_who_can_receive_emails()
-    for admin in admins:
-        Notification.objects.create(
-            user=admin,
-            message=message,
-            url=application.admin_url)
+    send_notifications(
+        get_admins_who_can_receive_emails(),
+        message,
+        url=application.admin_url)
 
 
 @receiver(application_unsubmitted)
 def receive_application_unsubmitted(sender, application: PermitApplication, **kwargs):
     message = f'Permit application {application.no} is unsubmitted.'
     logger.info(message)
-    notify_admins_about_unsubmitted_application.delay(
-        application_id=application.id)
+    enqueue(notify_admins_about_unsubmitted_application,
+            application_id=application.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=application.id,
-            object_repr=_(str(application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, application, message)
 
 
 @receiver(application_unsubmitted)
@@ -105,29 +101,17 @@ def create_notifications_for_application_unsubmitted(
     A permit application for type {application.get_permit_type_display()} with
     number {application.no} has been unsubmitted by {application.client.name}.
     """
-    admins = get_admins_who_can_receive_emails()
-    for admin in admins:
-        Notification.objects.create(
-            user=admin,
-            message=message)
+    send_notifications(get_admins_who_can_receive_emails(), message)
 
 
 @receiver(application_accepted)
 def receive_application_accepted(sender, application: PermitApplication, **kwargs):
     message = f'Permit application {application.no} is accepted.'
     logger.info(message)
-    notify_client_about_accepted_application.delay(
-        application_id=application.id)
+    enqueue(notify_client_about_accepted_application,
+            application_id=application.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=application.id,
-            object_repr=_(str(application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, application, message)
 
     url = reverse_lazy('update_application', args=[application.id])
     message = f'''
@@ -143,9 +127,9 @@ def create_notifications_application_accepted(
     Your permit application for type {application.get_permit_type_display()}
     with number {application.no} has been accepted.
     """
-    Notification.objects.create(
-        user=application.client,
-        message=message,
+    send_notifications(
+        [application.client],
+        message,
         url=application.client_url)
 
 
@@ -153,18 +137,10 @@ def create_notifications_application_accepted(
 def receive_application_returned(sender, application: PermitApplication, **kwargs):
     message = f'Permit application {application.no} is returned.'
     logger.info(message)
-    notify_client_about_returned_application.delay(
-        application_id=application.id)
+    enqueue(notify_client_about_returned_application,
+            application_id=application.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=application.id,
-            object_repr=_(str(application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, application, message)
 
 
 @receiver(application_returned)
@@ -176,9 +152,9 @@ def create_notifications_for_application_returned(
     with number {application.no} was returned. Please check the admin's
     remarks explaining the needed action.
     """
-    Notification.objects.create(
-        user=application.client,
-        message=message,
+    send_notifications(
+        [application.client],
+        message,
         url=application.client_url)
 
 
@@ -186,18 +162,10 @@ def create_notifications_for_application_returned(
 def receive_inspection_scheduled(sender, application: PermitApplication, **kwargs):
     message = f'Inspection for {application.no} has been scheduled on {application.inspection.scheduled_date}'
     logger.info(message)
-    notify_client_and_officer_about_scheduled_inspection.delay(
-        application_id=application.id)
+    enqueue(notify_client_and_officer_about_scheduled_inspection,
+            application_id=application.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=application.id,
-            object_repr=_(str(application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, application, message)
 
 
 @receiver(inspection_signed)
@@ -208,95 +176,115 @@ def receive_inspection_signed(sender, application: PermitApplication, **kwargs):
         f'Inspection for {application.no} has been signed by '
         f'{application.inspection.signatures[0].person.name}.')
     logger.info(message)
-    notify_admins_about_signed_inspection.delay(
-        application_id=application.id)
+    enqueue(notify_admins_about_signed_inspection,
+            application_id=application.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
-        LogEntry.objects.log_action(
-            user_id=sender.id,
-            content_type_id=content_type.id,
-            object_id=application.id,
-            object_repr=_(str(application)),
-            action_flag=CHANGE,
-            change_message=_(message)
-        )
+        log_change(sender, application, message)
 
 
 @receiver(permit_created)
 def receive_permit_created(sender, permit: Permit, **kwargs):
     message = f'Permit {permit.permit_no} has been initially created.'
     logger.info(message)
-    notify_signatories_about_created_permit.delay(
-        permit_id=permit.id)
+    enqueue(notify_signatories_about_created_permit,
+            permit_id=permit.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
         application = PermitApplication.objects.filter(permit=permit).first()
         if application:
-            LogEntry.objects.log_action(
-                user_id=sender.id,
-                content_type_id=content_type.id,
-                object_id=application.id,
-                object_repr=_(str(application)),
-                action_flag=CHANGE,
-                change_message=_(message)
-            )
+            log_change(sender, application, message)
 
 
 @receiver(permit_signed)
 def receive_permit_signed(sender, permit: Permit, **kwargs):
     message = f'Permit {permit.permit_no} has been signed by {permit.signatures.first().person.name}.'
     logger.info(message)
-    notify_admins_about_signed_permit.delay(
-        permit_id=permit.id)
+    enqueue(notify_admins_about_signed_permit,
+            permit_id=permit.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
         application = PermitApplication.objects.filter(permit=permit).first()
         if application:
-            LogEntry.objects.log_action(
-                user_id=sender.id,
-                content_type_id=content_type.id,
-                object_id=application.id,
-                object_repr=_(str(application)),
-                action_flag=CHANGE,
-                change_message=_(message)
-            )
+            log_change(sender, application, message)
 
 
 @receiver(permit_released)
 def receive_permit_released(sender, permit: Permit, **kwargs):
     message = f'Permit {permit.permit_no} has been released.'
     logger.info(message)
-    notify_client_and_admins_about_released_permit.delay(
-        permit_id=permit.id)
+    enqueue(notify_client_and_admins_about_released_permit,
+            permit_id=permit.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
         application = PermitApplication.objects.filter(permit=permit).first()
         if application:
-            LogEntry.objects.log_action(
-                user_id=sender.id,
-                content_type_id=content_type.id,
-                object_id=application.id,
-                object_repr=_(str(application)),
-                action_flag=CHANGE,
-                change_message=_(message)
-            )
+            log_change(sender, application, message)
 
 
 @receiver(permit_validated)
 def receive_permit_validated(sender, permit: Permit, **kwargs):
     message = f'Permit {permit.permit_no} has been validated.'
     logger.info(message)
-    notify_client_and_admins_about_validated_permit.delay(
-        permit_id=permit.id)
+    enqueue(notify_client_and_admins_about_validated_permit,
+            permit_id=permit.id)
     if isinstance(sender, User):
-        content_type = ContentType.objects.get_for_model(PermitApplication)
         application = PermitApplication.objects.filter(permit=permit).first()
         if application:
-            LogEntry.objects.log_action(
-                user_id=sender.id,
-                content_type_id=content_type.id,
-                object_id=application.id,
-                object_repr=_(str(application)),
-                action_flag=CHANGE,
-                change_message=_(message)
-            )
+            log_change(sender, application, message)
+
+
+@receiver(pre_save, sender=TransportEntry)
+def remember_previous_transport_ltp(sender, instance: TransportEntry, **kwargs):
+    instance._previous_ltp_id = None
+    if instance.pk:
+        instance._previous_ltp_id = TransportEntry.objects \
+            .filter(pk=instance.pk) \
+            .values_list('ltp', flat=True) \
+            .first()
+
+
+@receiver(post_save, sender=TransportEntry)
+def refresh_statistics_for_saved_transport(sender, instance: TransportEntry, **kwargs):
+    refresh_transport_statistics_on_commit(
+        {instance.ltp_id, getattr(instance, '_previous_ltp_id', None)})
+
+
+@receiver(post_delete, sender=TransportEntry)
+def refresh_statistics_for_deleted_transport(sender, instance: TransportEntry, **kwargs):
+    refresh_transport_statistics_on_commit([instance.ltp_id])
+
+
+@receiver(pre_save, sender=LocalTransportPermit)
+def remember_previous_transport_slices(sender, instance: LocalTransportPermit, **kwargs):
+    # The transport date or client may change, e.g. in the admin, which
+    # moves the entries out of their current slice
+    instance._previous_statistic_slices = set()
+    if instance.pk:
+        instance._previous_statistic_slices = \
+            get_transport_statistic_slices([instance.pk])
+
+
+@receiver(post_save, sender=LocalTransportPermit)
+def refresh_statistics_for_saved_permit(sender, instance: LocalTransportPermit, **kwargs):
+    refresh_transport_statistics_on_commit(
+        [instance.pk], getattr(instance, '_previous_statistic_slices', ()))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def forget_permitted_species(sender, instance, **kwargs):
+    if isinstance(instance, Permit):
+        client_ids = [instance.client_id]
+    elif isinstance(instance, PermittedToCollectAnimal):
+        client_ids = list(WildlifeCollectorPermit.objects
+                          .filter(id=instance.wcp_id)
+                          .values_list('client', flat=True))
+    else:
+        return
+    # Once committed, so a concurrent read cannot cache the old rows again
+    transaction.on_commit(partial(clear_permitted_species, client_ids))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def refresh_current_permits(sender, instance, **kwargs):
+    # A plain Permit may be a WFP or WCP too, e.g. when it's validated
+    if type(instance) in (Permit, WildlifeFarmPermit, WildlifeCollectorPermit):
+        Client.refresh_current_permits([instance.client_id])
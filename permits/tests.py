@@ -1,3 +1,170 @@
+from datetime import date
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import Client
+from animals.models import Species, SubSpecies
+from payments.models import PaymentOrder, PaymentOrderItem
+
+from .models import (
+    Status,
+    PermitType,
+    PermitApplication,
+    WildlifeFarmPermit,
+    WildlifeCollectorPermit,
+    LocalTransportPermit,
+    TransportEntry,
+    PermittedToCollectAnimal,
+    Remarks
+)
+from .permitted import get_permitted_species
+from .reports import get_quarterly_report_data
+
+
+class QuarterlyReportDataTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        species = Species.objects.create(name='Butterfly', type='FAUNA')
+        cls.sub_species = [
+            SubSpecies.objects.create(
+                main_species=species, input_code=f'B{i}',
+                common_name=f'Butterfly {i}', scientific_name=f'Papilio {i}')
+            for i in range(3)]
+
+    def create_client(self, no):
+        client = Client.objects.create(
+            username=f'client{no}', email=f'client{no}@example.com',
+            first_name=f'Client {no}', last_name='Test', address='Boac',
+            phone_number='+639171234567')
+        wfp = WildlifeFarmPermit.objects.create(
+            permit_no=f'WFP-{no}', status=Status.RELEASED, client=client,
+            farm_name=f'Farm {no}')
+        wcp = WildlifeCollectorPermit.objects.create(
+            permit_no=f'WCP-{no}', status=Status.RELEASED, client=client)
+        for month in (1, 2, 3):
+            payment_order = PaymentOrder.objects.create(
+                no=f'PO-{no}-{month}', nature_of_doc_being_secured='Wildlife',
+                client=client)
+            PaymentOrderItem.objects.create(
+                payment_order=payment_order, legal_basis='Basis',
+                description='Fee', amount=100)
+            ltp = LocalTransportPermit.objects.create(
+                permit_no=f'LTP-{no}-{month}', status=Status.RELEASED,
+                client=client, wfp=wfp, wcp=wcp, transport_location='Manila',
+                transport_date=date(2024, month, 15),
+                payment_order=payment_order)
+            application = PermitApplication.objects.create(
+                no=f'APP-{no}-{month}', client=client,
+                permit_type=PermitType.LTP, status=Status.RELEASED,
+                permit=ltp)
+            Remarks.objects.create(
+                permit_application=application, content='Remarks')
+            for sub_species in self.sub_species:
+                TransportEntry.objects.create(
+                    sub_species=sub_species, ltp=ltp, quantity=month,
+                    description='Live', permit_application=application)
+        LocalTransportPermit.objects.filter(client=client) \
+            .update(created_at=date(2024, 2, 1))
+        return client
+
+    def load_report(self):
+        data = get_quarterly_report_data(2024, 1)
+        for client in data['clients']['list']:
+            for ltp in client['ltps']:
+                list(ltp.species_to_transport.all())
+        return data
+
+    def test_totals(self):
+        self.create_client(1)
+        data = self.load_report()
+
+        client = data['clients']['list'][0]
+        self.assertEqual(client['farm_name'], 'Farm 1')
+        self.assertEqual(client['permits_issued_in_month'], [1, 1, 1])
+        self.assertEqual(client['total_permits'], 3)
+        self.assertEqual(client['fees_collected'], 300.0)
+        self.assertEqual(client['total_species'], 18)
+        self.assertEqual(len(client['ltps']), 3)
+
+    def test_query_count_does_not_depend_on_clients(self):
+        self.create_client(1)
+        with self.assertNumQueries(3):
+            self.load_report()
+
+        for no in range(2, 12):
+            self.create_client(no)
+        with self.assertNumQueries(3):
+            data = self.load_report()
+        self.assertEqual(len(data['clients']['list']), 11)
+
+
+class PermittedSpeciesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        species = Species.objects.create(name='Butterfly', type='FAUNA')
+        cls.sub_species = [
+            SubSpecies.objects.create(
+                main_species=species, input_code=f'B{i}',
+                common_name=f'Butterfly {i}', scientific_name=f'Papilio {i}')
+            for i in range(3)]
+        cls.namesake = SubSpecies.objects.create(
+            main_species=species, input_code='B0X', common_name='Butterfly 0',
+            scientific_name='Papilio 0x')
+        cls.client_user = Client.objects.create(
+            username='client', email='client@example.com')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_wcp(self, no, status, quantities):
+        wcp = WildlifeCollectorPermit.objects.create(
+            permit_no=f'WCP-{no}', status=status, client=self.client_user)
+        for sub_species, quantity in quantities.items():
+            PermittedToCollectAnimal.objects.create(
+                wcp=wcp, sub_species=sub_species, quantity=quantity)
+        return wcp
+
+    def test_released_permits(self):
+        first, second, third = self.sub_species
+        self.create_wcp(1, Status.RELEASED, {first: 5, second: 2})
+        self.create_wcp(2, Status.RELEASED, {first: 10})
+        self.create_wcp(3, Status.DRAFT, {third: 1})
+
+        permitted = get_permitted_species(self.client_user.id)
+        self.assertTrue(permitted.has_wcp)
+        self.assertEqual(permitted.ids, {first.id, second.id})
+        self.assertEqual(permitted.max_quantity(first), 10)
+        self.assertIsNone(permitted.max_quantity(third))
+        self.assertTrue(permitted.allows(self.namesake))
+        self.assertFalse(permitted.allows(third))
+
+        with self.assertNumQueries(0):
+            get_permitted_species(self.client_user.id)
+
+    def test_without_wcp(self):
+        permitted = get_permitted_species(self.client_user.id)
+        self.assertFalse(permitted.has_wcp)
+        self.assertEqual(permitted.ids, set())
+
+    def test_cleared_on_commit(self):
+        first, second, _ = self.sub_species
+        wcp = self.create_wcp(1, Status.RELEASED, {first: 5})
+        get_permitted_species(self.client_user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PermittedToCollectAnimal.objects.create(
+                wcp=wcp, sub_species=second, quantity=3)
+            # Kept until the change is committed
+            self.assertEqual(
+                get_permitted_species(self.client_user.id).ids, {first.id})
+        self.assertEqual(
+            get_permitted_species(self.client_user.id).ids,
+            {first.id, second.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            wcp.status = Status.EXPIRED
+            wcp.save()
+        self.assertFalse(get_permitted_species(self.client_user.id).has_wcp)
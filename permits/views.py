@@ -23,6 +23,8 @@ from django.core.exceptions import PermissionDenied
 from users.views import CustomLoginRequiredMixin
 from users.models import Client, Validator
 
+from animals.stats import refresh_transport_statistics
+
 from .models import (
     PermitApplication,
     Status,
@@ -31,7 +33,8 @@ from .models import (
     CollectionEntry,
     CollectorOrTrapper,
     Permit,
-    Validation
+    Validation,
+    Signature
 )
 from .forms import (
     PermitApplicationForm,
@@ -100,7 +103,7 @@ class PermitApplicationListView(CustomLoginRequiredMixin, ListView):
         qs = super().get_queryset()
         filters = PermitApplicationFilter(
             self.request.GET, request=self.request, queryset=qs)
-        return filters.qs.order_by('-id')
+        return filters.qs.with_submittability().order_by('-id')
 
 
 class PermitApplicationUpdateView(CustomLoginRequiredMixin, UpdateView):
@@ -143,6 +146,7 @@ class PermitApplicationUpdateView(CustomLoginRequiredMixin, UpdateView):
                 prefix='requirement')
 
         context['needed_requirements'] = self.object.needed_requirements
+        Signature.prefetch([getattr(self.object, 'paymentorder', None)])
 
         content_type = ContentType.objects.get_for_model(PermitApplication)
         context['logs'] = LogEntry.objects \
@@ -236,10 +240,11 @@ class SubmitRedirectView(CustomLoginRequiredMixin, SingleObjectMixin, RedirectVi
         same_url = reverse_lazy('update_application', kwargs={
                                 'pk': permit_application.id})
 
-        if not permit_application.submittable:
+        reasons = permit_application.unsubmittable_reasons
+        if reasons:
             messages.warning(
                 self.request,
-                'Your permit application is incomplete.')
+                'Your permit application is incomplete. ' + ' '.join(reasons))
             return same_url
 
         permit_application.status = Status.SUBMITTED
@@ -294,7 +299,8 @@ class PermitDetailView(CustomLoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        permit: Permit = self.get_object().subclass
+        permit: Permit = self.object.subclass
+        Signature.prefetch([permit, permit.inspection])
         context['permit'] = permit
 
         if 'validated' in self.request.GET and permit.status == Status.USED:
@@ -326,7 +332,7 @@ class PermitListView(CustomLoginRequiredMixin, ListView):
         qs = super().get_queryset()
         filters = PermitFilter(
             self.request.GET, request=self.request, queryset=qs)
-        return filters.qs.order_by('-id')
+        return filters.qs.with_current_status().order_by('-id')
 
 
 class PermitApplicationItemDeleteView(CustomLoginRequiredMixin, DeleteView):
@@ -392,6 +398,7 @@ class ValidateRedirectView(CustomLoginRequiredMixin, SingleObjectMixin, Redirect
                 permit=permit, validator=self.request.user)
             permit.status = Status.USED
             permit.save()
+            refresh_transport_statistics([permit.id])
             params = '?'+urlencode({'validated': True})
 
             permit_validated.send(sender=self.request.user, permit=permit)
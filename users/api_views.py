@@ -1,9 +1,27 @@
 from rest_framework import mixins
 from rest_framework import viewsets
 from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
 
+from .counters import get_unread_count, change_unread_counts
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, MarkReadSerializer
+
+
+class NotificationPagination(CursorPagination):
+    """
+    Cursor pagination of the newest notifications first.
+
+    The cursor only holds the `created_at` of the last notification plus an
+    offset over the notifications sharing it, so a page is found from the
+    index of the user's notifications instead of skipping all the previous
+    pages. The `id` only makes the order stable: the offset is bounded by
+    the notifications of a user created at the same instant, which are few.
+    """
+
+    ordering = ('-created_at', '-id')
 
 
 class NotificationViewSet(
@@ -16,11 +34,44 @@ class NotificationViewSet(
     permission_classes = [permissions.IsAuthenticated]
     queryset = Notification.objects.none()
     serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         notifications = (
             Notification
             .objects
             .filter(user__id=self.request.user.id)
-            .order_by('-created_at'))
+            .order_by('-created_at', '-id'))
         return notifications
+
+    def perform_update(self, serializer):
+        was_read = serializer.instance.read
+        notification = serializer.save()
+        if notification.read != was_read:
+            change_unread_counts(
+                [notification.user_id], -1 if notification.read else 1)
+
+    @action(detail=False, url_path='unread-count')
+    def unread_count(self, request):
+        """Return the number of unread notifications of the user."""
+        return Response({'unread_count': get_unread_count(request.user.id)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read',
+            serializer_class=MarkReadSerializer)
+    def mark_read(self, request):
+        """Mark the given notifications, or all of them when no ids are
+        given, as read with a single update."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        notifications = self.get_queryset().filter(read=False)
+        ids = serializer.validated_data.get('ids')
+        if ids is not None:
+            notifications = notifications.filter(id__in=ids)
+        marked = notifications.order_by().update(read=True)
+        change_unread_counts([request.user.id], -marked)
+
+        return Response({
+            'marked': marked,
+            'unread_count': get_unread_count(request.user.id)
+        })
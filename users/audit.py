@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .batching import batch_on_commit
+
+
+class AuditBatch(list):
+    """The log records of one transaction, written when it commits."""
+
+    def __call__(self):
+        if settings.AUDIT_LOG_DEFERRED:
+            from .tasks import create_log_entries
+            create_log_entries.delay(records=self)
+        else:
+            write_log_entries(self)
+
+
+def write_log_entries(records):
+    LogEntry.objects.bulk_create([
+        LogEntry(
+            action_time=record['action_time'],
+            user_id=record['user_id'],
+            content_type_id=record['content_type_id'],
+            object_id=record['object_id'],
+            object_repr=record['object_repr'],
+            action_flag=record['action_flag'],
+            change_message=record['change_message'])
+        for record in records])
+
+
+def log_change(user, obj, message, action_flag=CHANGE):
+    """
+    Record an admin log entry about obj, done by the given user (or user id).
+
+    Nothing is written in the current request: the records of a transaction
+    are collected and inserted with a single bulk insert when it commits,
+    or handed to a task when `AUDIT_LOG_DEFERRED` is set. Outside of a
+    transaction the record is written right away.
+    """
+    record = {
+        'action_time': timezone.now(),
+        'user_id': getattr(user, 'id', user),
+        'content_type_id': ContentType.objects.get_for_model(obj).id,
+        'object_id': str(obj.pk),
+        'object_repr': _(str(obj))[:200],
+        'action_flag': action_flag,
+        'change_message': _(message)
+    }
+    batch = batch_on_commit('audit', AuditBatch)
+    if batch is None:
+        AuditBatch([record])()
+    else:
+        batch.append(record)
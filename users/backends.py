@@ -0,0 +1,64 @@
+import logging
+
+from django.apps import apps
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import User
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached values change shape, so the old ones are ignored
+USER_SUBCLASS_CACHE_VERSION = 1
+
+
+def get_user_subclass_cache_key(user_id):
+    return f'users:subclass:{user_id}'
+
+
+def clear_user_subclass_cache(user_id):
+    try:
+        cache.delete(get_user_subclass_cache_key(user_id),
+                     version=USER_SUBCLASS_CACHE_VERSION)
+    except Exception:  # pylint: disable=broad-except
+        logger.warning('Cannot clear the cached subclass of user %s.', user_id)
+
+
+class SubclassModelBackend(ModelBackend):
+    """
+    Authenticate like `ModelBackend`, but load the user of each request as
+    its concrete subclass (Client, Admin, Signatory, ...).
+
+    The subclass of each user id is cached, so the user is read from its own
+    table with a single join instead of resolving the subclass with a join on
+    every subclass table, and `user.subclass` needs no further query.
+    """
+
+    def get_user(self, user_id):
+        key = get_user_subclass_cache_key(user_id)
+        try:
+            label = cache.get(key, version=USER_SUBCLASS_CACHE_VERSION)
+        except Exception:  # pylint: disable=broad-except
+            # An unavailable cache only costs the subclass joins
+            logger.warning('Cannot read the cached subclass of user %s.', user_id)
+            label = None
+
+        try:
+            if label is None:
+                user = User.objects.select_subclasses().get(pk=user_id)
+                try:
+                    cache.set(key, user._meta.label,
+                              version=USER_SUBCLASS_CACHE_VERSION)
+                except Exception:  # pylint: disable=broad-except
+                    logger.warning('Cannot cache the subclass of user %s.',
+                                   user_id)
+            else:
+                model = apps.get_model(label)
+                user = model._default_manager.get(pk=user_id)
+        except (User.DoesNotExist, LookupError):
+            clear_user_subclass_cache(user_id)
+            return None
+
+        user._subclass = user
+        return user if self.user_can_authenticate(user) else None
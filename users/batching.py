@@ -0,0 +1,32 @@
+from weakref import WeakKeyDictionary, WeakValueDictionary
+
+from django.db import transaction
+
+
+# The pending batches of each savepoint of each connection. A batch is only
+# referenced by its on-commit hook otherwise, so it's dropped from here once
+# the hook has run or its savepoint was rolled back
+_pending_batches = WeakKeyDictionary()
+
+
+def batch_on_commit(key, factory):
+    """
+    Return the batch of the given key for the current savepoint, created
+    with `factory` and called once the transaction commits.
+
+    A batch is joined by everything done in the same savepoint, so its work
+    never outlives the savepoint it was added in. Outside of a transaction
+    there is nothing to wait for: None is returned and the caller does the
+    work right away.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+
+    batches = _pending_batches.setdefault(connection, WeakValueDictionary())
+    batch_key = (key, tuple(connection.savepoint_ids))
+    batch = batches.get(batch_key)
+    if batch is None:
+        batch = batches[batch_key] = factory()
+        transaction.on_commit(batch)
+    return batch
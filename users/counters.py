@@ -0,0 +1,54 @@
+from collections import Counter
+
+from django.core.cache import cache
+
+from .models import Notification
+
+
+# Bump when the cached values change shape, so the old ones are ignored
+UNREAD_COUNT_CACHE_VERSION = 1
+
+# A missed increment or decrement is only off until the count is recounted
+UNREAD_COUNT_TIMEOUT = 60 * 10
+
+
+def get_unread_count_cache_key(user_id):
+    return f'users:notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    """Return the number of unread notifications of a user, counting them
+    only when the cached counter is missing."""
+    key = get_unread_count_cache_key(user_id)
+    count = cache.get(key, version=UNREAD_COUNT_CACHE_VERSION)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        cache.add(key, count, timeout=UNREAD_COUNT_TIMEOUT,
+                  version=UNREAD_COUNT_CACHE_VERSION)
+    return max(count, 0)
+
+
+def change_unread_counts(user_ids, delta=1):
+    """
+    Add delta to the cached counter of each of the given user ids, once per
+    occurrence of the id.
+
+    A counter that isn't cached is left missing, so it's counted from the
+    database the next time it's read.
+    """
+    if not delta:
+        return
+    for user_id, occurrences in Counter(user_ids).items():
+        key = get_unread_count_cache_key(user_id)
+        try:
+            count = cache.incr(key, delta * occurrences,
+                               version=UNREAD_COUNT_CACHE_VERSION)
+        except ValueError:
+            continue
+        if count < 0:
+            clear_unread_count(user_id)
+
+
+def clear_unread_count(user_id):
+    cache.delete(get_unread_count_cache_key(user_id),
+                 version=UNREAD_COUNT_CACHE_VERSION)
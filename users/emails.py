@@ -1,17 +1,27 @@
+import logging
+
+from django.core.mail import get_connection
 from django_yubin.message_views import TemplatedHTMLEmailMessageView
 
 from biodiversity.context_processors import custom_global_vars
 
 
+logger = logging.getLogger(__name__)
+
+
 class EmailContextMixin:
+    _shared_context = None
 
     def __init__(self, user, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = user
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context.update(custom_global_vars(None))
+        if self._shared_context is not None:
+            context = dict(self._shared_context, **kwargs)
+        else:
+            context = super().get_context_data(**kwargs)
+            context.update(custom_global_vars(None))
 
         if hasattr(self, 'user'):
             context['user'] = self.user
@@ -23,6 +33,57 @@ class EmailContextMixin:
         kwargs['to'] = (self.user.email, )
         return super().render_to_message(*args, **kwargs)
 
+    @classmethod
+    def send_batch(cls, users, *args, **kwargs):
+        """
+        Send this email to each of the users over a single connection.
+
+        The templates are loaded and the shared context is built only once,
+        then one message is rendered per user. A user whose message cannot be
+        rendered or sent is logged and skipped. Return the number of sent
+        messages.
+        """
+        from .models import User
+
+        users = list(users)
+        if not users:
+            return 0
+
+        # The templates check the user type, so resolve them all at once
+        subclasses = User.objects.select_subclasses().in_bulk(
+            [user.id for user in users])
+        for user in users:
+            user._subclass = subclasses.get(user.id, user)
+
+        # Pin the loaded templates and the shared context to a single view
+        view = cls(users[0], *args, **kwargs)
+        view.subject_template = view.subject_template
+        view.body_template = view.body_template
+        if hasattr(view, 'html_body_template_name'):
+            view.html_body_template = view.html_body_template
+        view._shared_context = view.get_context_data()
+
+        messages = []
+        for user in users:
+            view.user = user
+            try:
+                messages.append(view.render_to_message())
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Cannot render %s for %s.',
+                                 cls.__name__, user.email)
+
+        sent = 0
+        with get_connection() as connection:
+            for message in messages:
+                try:
+                    sent += connection.send_messages([message]) or 0
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception('Cannot send %s to %s.',
+                                     cls.__name__, ', '.join(message.to))
+        logger.info('Sent %s of %s %s emails.',
+                    sent, len(users), cls.__name__)
+        return sent
+
 
 class RegistrationEmailView(EmailContextMixin, TemplatedHTMLEmailMessageView):
     subject_template_name = 'users/emails/registration/subject.txt'
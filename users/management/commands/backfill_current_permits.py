@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import Client
+
+
+class Command(BaseCommand):
+    help = 'Fill in the current WCP, WFP and farm name of every client.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of clients updated per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        count = 0
+        while True:
+            client_ids = list(Client.objects
+                              .filter(pk__gt=last_id)
+                              .order_by('pk')
+                              .values_list('pk', flat=True)[:batch_size])
+            if not client_ids:
+                break
+            with transaction.atomic():
+                Client.refresh_current_permits(client_ids)
+            last_id = client_ids[-1]
+            count += len(client_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Filled in the current permits of {count} clients.'))
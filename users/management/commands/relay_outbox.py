@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.outbox import relay_outbox, purge_outbox
+
+
+class Command(BaseCommand):
+    help = 'Publish the tasks in the outbox to the broker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of messages published per batch.')
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Seconds to wait when the outbox is empty.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain the outbox once and exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            published = relay_outbox(options['batch_size'])
+            self.stdout.write(f'Published {published} messages.')
+            return
+
+        self.stdout.write('Relaying the outbox...')
+        last_purge = 0
+        while True:
+            close_old_connections()
+            if time.monotonic() - last_purge > 3600:
+                purge_outbox()
+                last_purge = time.monotonic()
+            if not relay_outbox(options['batch_size']):
+                time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:19
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_created_at(apps, schema_editor):
+    # The notifications from before the field was added have no creation
+    # date, and the cursor of the pagination cannot point at a null
+    Notification = apps.get_model('users', 'Notification')
+    added_at = datetime.datetime(2024, 3, 3, tzinfo=datetime.timezone.utc)
+    Notification.objects \
+        .filter(created_at__isnull=True) \
+        .update(created_at=Coalesce('updated_at', models.Value(added_at)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0032_alter_notification_read'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='users_notif_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permits', '0107_alter_signature_options'),
+        ('users', '0034_outbox_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='current_farm_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='current_wcp',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='permits.wildlifecollectorpermit'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='current_wfp',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='permits.wildlifefarmpermit'),
+        ),
+    ]
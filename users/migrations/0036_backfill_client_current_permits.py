@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def backfill_current_permits(apps, schema_editor):
+    # Same as Client.refresh_current_permits, which cannot be used with the
+    # historical models
+    Client = apps.get_model('users', 'Client')
+    WildlifeCollectorPermit = apps.get_model('permits', 'WildlifeCollectorPermit')
+    WildlifeFarmPermit = apps.get_model('permits', 'WildlifeFarmPermit')
+
+    client_ids = list(Client.objects.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(client_ids), BATCH_SIZE):
+        batch = client_ids[i:i + BATCH_SIZE]
+        wcps = dict(WildlifeCollectorPermit.objects
+                    .filter(client__in=batch, status='RELEASED')
+                    .order_by('created_at', 'id')
+                    .values_list('client', 'id'))
+        wfps = dict(WildlifeFarmPermit.objects
+                    .filter(client__in=batch, status='RELEASED')
+                    .order_by('created_at', 'id')
+                    .values_list('client', 'id'))
+        farm_names = dict(WildlifeFarmPermit.objects
+                          .filter(client__in=batch)
+                          .order_by('-created_at', '-id')
+                          .values_list('client', 'farm_name'))
+        Client.objects.bulk_update([
+            Client(pk=client_id,
+                   current_wcp_id=wcps.get(client_id),
+                   current_wfp_id=wfps.get(client_id),
+                   current_farm_name=farm_names.get(client_id))
+            for client_id in batch],
+            ['current_wcp', 'current_wfp', 'current_farm_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0035_client_current_permits'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_current_permits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0036_backfill_client_current_permits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
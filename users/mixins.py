@@ -8,6 +8,13 @@ from django.conf import settings
 
 class AdminMixin:
 
+    def get_object(self, request, object_id, from_field=None):
+        from permits.models import Signature
+
+        obj = super().get_object(request, object_id, from_field)
+        Signature.prefetch([obj])
+        return obj
+
     def change_view(self, request, object_id, form_url='', extra_context=None):
         from payments.models import PaymentOrder
         from payments.models import Payment
@@ -21,7 +28,7 @@ class AdminMixin:
         extra_context['current_user_has_signed'] = False
         if obj:
             for sign in obj.signatures:
-                if sign.person == request.user:
+                if sign.person_id == request.user.id:
                     extra_context['current_user_has_signed'] = True
                     break
 
@@ -93,6 +100,10 @@ class ModelMixin:
 
     @property
     def signatures(self):
+        # Signable models have a prefetchable relation to their signatures
+        if hasattr(self, 'signature_set'):
+            return self.signature_set.all()
+
         from permits.models import Signature
         model_type = ContentType.objects.get_for_model(self.__class__)
         return Signature.objects.filter(content_type__id=model_type.id, object_id=self.id)
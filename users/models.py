@@ -81,31 +81,54 @@ class Client(User):
     address = models.CharField(max_length=255)
     agreed_to_terms_and_conditions = models.BooleanField(default=False)
 
-    @property
-    def current_wcp(self):
-        try:
-            wcp = WildlifeCollectorPermit.objects \
-                .filter(client=self, status=Status.RELEASED) \
-                .latest('-created_at')
-        except WildlifeCollectorPermit.DoesNotExist:
-            wcp = None
-        return wcp
-
-    @property
-    def current_wfp(self):
-        try:
-            wfp = WildlifeFarmPermit.objects \
-                .filter(client=self, status=Status.RELEASED) \
-                .latest('-created_at')
-        except WildlifeFarmPermit.DoesNotExist:
-            wfp = None
-        return wfp
-
-    @property
-    def current_farm_name(self):
-        return WildlifeFarmPermit.objects \
-            .filter(client=self) \
-            .latest('-created_at').farm_name
+    # The client's released permits and farm name, kept up to date by
+    # refresh_current_permits() whenever their permits change
+    current_wcp = models.ForeignKey(
+        'permits.WildlifeCollectorPermit', on_delete=models.SET_NULL,
+        null=True, blank=True, editable=False, related_name='+')
+    current_wfp = models.ForeignKey(
+        'permits.WildlifeFarmPermit', on_delete=models.SET_NULL,
+        null=True, blank=True, editable=False, related_name='+')
+    current_farm_name = models.CharField(
+        max_length=255, null=True, blank=True, editable=False)
+
+    @classmethod
+    def refresh_current_permits(cls, client_ids):
+        """
+        Point the given clients to their latest released WCP and WFP, and
+        copy the farm name of their first WFP, whatever its status, which
+        is the one the reports have always shown.
+
+        Three queries and one update are made no matter how many clients
+        there are.
+        """
+        client_ids = {client_id for client_id in client_ids if client_id}
+        if not client_ids:
+            return
+
+        # The last value of each client wins: their latest permit, or their
+        # first WFP for the farm name
+        wcps = dict(WildlifeCollectorPermit.objects
+                    .filter(client__in=client_ids, status=Status.RELEASED)
+                    .order_by('created_at', 'id')
+                    .values_list('client', 'id'))
+        wfps = dict(WildlifeFarmPermit.objects
+                    .filter(client__in=client_ids, status=Status.RELEASED)
+                    .order_by('created_at', 'id')
+                    .values_list('client', 'id'))
+        farm_names = dict(WildlifeFarmPermit.objects
+                          .filter(client__in=client_ids)
+                          .order_by('-created_at', '-id')
+                          .values_list('client', 'farm_name'))
+
+        clients = [
+            cls(pk=client_id,
+                current_wcp_id=wcps.get(client_id),
+                current_wfp_id=wfps.get(client_id),
+                current_farm_name=farm_names.get(client_id))
+            for client_id in client_ids]
+        cls.objects.bulk_update(
+            clients, ['current_wcp', 'current_wfp', 'current_farm_name'])
 
 
 class Admin(User):
@@ -164,3 +187,33 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the notifications of a user
+            models.Index(fields=['user', '-created_at', '-id'],
+                         name='users_notif_user_created_idx'),
+        ]
+
+
+class OutboxMessage(models.Model):
+    """A task to run, written in the same transaction as the change it's
+    about and published to the broker by the outbox relay."""
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    dedup_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    # Claimed by a relay publishing it until then
+    leased_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='users_outbox_pending_idx',
+                         condition=models.Q(dispatched_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f'{self.task} {self.kwargs}'
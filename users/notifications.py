@@ -0,0 +1,23 @@
+from django.db.models import QuerySet
+
+from .outbox import enqueue
+from .tasks import create_notifications
+
+
+def send_notifications(users, message, url=None):
+    """
+    Notify the given users (user instances, ids or a queryset of users).
+
+    Nothing but the outbox message is written in the current request: once
+    the transaction commits, a task creates all the notifications with a
+    single bulk insert.
+    """
+    if isinstance(users, QuerySet):
+        user_ids = list(users.values_list('id', flat=True))
+    else:
+        user_ids = [getattr(user, 'id', user) for user in users]
+    if not user_ids:
+        return
+
+    url = str(url) if url is not None else None
+    enqueue(create_notifications, user_ids=user_ids, message=message, url=url)
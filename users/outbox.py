@@ -0,0 +1,112 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from celery import current_app
+
+from .models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+# A relay has this long to publish the messages it claimed, after which
+# they're claimed again by the next one
+OUTBOX_LEASE = timedelta(minutes=5)
+
+
+def enqueue(task, dedup_key=None, **kwargs):
+    """
+    Run the given task with the given keyword arguments once the current
+    transaction commits.
+
+    The task is written to the outbox in the current transaction, so it's
+    dropped with a rollback and costs a single local insert: the outbox
+    relay publishes it to the broker. A task with the dedup key of another
+    one still in the outbox is ignored. When the tasks run eagerly (i.e.
+    there is no broker), it's simply run on commit.
+    """
+    if current_app.conf.task_always_eager:
+        transaction.on_commit(lambda: task.delay(**kwargs))
+        return
+
+    message = OutboxMessage(task=task.name, kwargs=kwargs, dedup_key=dedup_key)
+    if dedup_key is None:
+        message.save()
+    else:
+        OutboxMessage.objects.bulk_create([message], ignore_conflicts=True)
+
+
+def claim_outbox_messages(batch_size):
+    """Lease a batch of pending messages to this relay and return them.
+    The lease is committed right away, so no lock is held while they're
+    published."""
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(OutboxMessage.objects
+                        .select_for_update(skip_locked=True)
+                        .filter(dispatched_at__isnull=True)
+                        .filter(Q(leased_until__isnull=True)
+                                | Q(leased_until__lt=now))
+                        .order_by('id')[:batch_size])
+        OutboxMessage.objects \
+            .filter(id__in=[message.id for message in messages]) \
+            .update(leased_until=now + OUTBOX_LEASE)
+    return messages
+
+
+def relay_outbox(batch_size=100):
+    """
+    Publish the pending outbox messages to the broker, in batches, and
+    return how many were published.
+
+    Each batch is leased first, so several relays never publish the same
+    message, then published outside of any transaction, over a single
+    producer connection, so a slow broker holds no lock. A batch that
+    cannot be published is released for the next run, and the one of a
+    relay that died is picked up again once its lease is over.
+    """
+    published = 0
+    while True:
+        messages = claim_outbox_messages(batch_size)
+        if not messages:
+            break
+
+        sent_ids = []
+        try:
+            with current_app.producer_or_acquire() as producer:
+                for message in messages:
+                    # Nobody waits for the results of these tasks
+                    current_app.send_task(
+                        message.task, kwargs=message.kwargs,
+                        producer=producer, ignore_result=True)
+                    sent_ids.append(message.id)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Cannot publish the outbox messages.')
+
+        OutboxMessage.objects \
+            .filter(id__in=sent_ids) \
+            .update(dispatched_at=timezone.now(), leased_until=None)
+        failed_ids = [message.id for message in messages
+                      if message.id not in sent_ids]
+        if failed_ids:
+            OutboxMessage.objects \
+                .filter(id__in=failed_ids) \
+                .update(attempts=F('attempts') + 1, leased_until=None)
+        published += len(sent_ids)
+        if failed_ids:
+            break
+    return published
+
+
+def purge_outbox():
+    """Delete the messages published before the retention period, which
+    is how long their dedup keys are kept."""
+    deleted, _ = OutboxMessage.objects \
+        .filter(dispatched_at__lt=timezone.now() - timedelta(
+            days=settings.OUTBOX_RETENTION_DAYS)) \
+        .delete()
+    return deleted
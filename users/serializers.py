@@ -11,3 +11,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'message', 'url', 'read', 'created_at'
         ]
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """Serializer for the notifications to mark as read."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=1000)
@@ -5,7 +5,9 @@ from django.dispatch import Signal
 from django.contrib.auth.signals import user_logged_in
 from django.contrib.auth.models import Group
 from django.db import transaction
+from django.db.models.signals import post_delete
 
+from .backends import clear_user_subclass_cache
 from .models import User, Client
 from .tasks import send_account_created_email
 
@@ -41,3 +43,9 @@ def client_first_login(sender, user: User, request, **kwargs):
     if user.type is Client.__name__ and not user.is_initial_password_changed:
         # now what?
         pass
+
+
+@receiver(post_delete)
+def forget_deleted_user_subclass(sender, instance, **kwargs):
+    if isinstance(instance, User):
+        clear_user_subclass_cache(instance.id)
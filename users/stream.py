@@ -0,0 +1,200 @@
+import asyncio
+import importlib
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib import auth
+from django.http import parse_cookie
+
+from asgiref.sync import sync_to_async
+
+import redis
+import redis.asyncio
+
+from .serializers import NotificationSerializer
+
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_STREAM_PATH = '/api/notifications/stream/'
+
+# Redis channel of the notifications of each user
+NOTIFICATION_CHANNEL_PREFIX = 'users:notifications:'
+
+# A comment is sent this often, so idle connections aren't dropped
+NOTIFICATION_STREAM_HEARTBEAT = 20
+
+# Events of a client that stopped reading are dropped past this many
+NOTIFICATION_STREAM_QUEUE_SIZE = 100
+
+
+class NotificationHub:
+    """
+    Fan-out of published notifications to the streams connected to this
+    process.
+
+    Each stream has its own queue in the event loop of the server, fed by
+    relaying the Redis channel at `NOTIFICATION_STREAM_REDIS_URL` where the
+    workers publish the notifications they create.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.subscribers = {}
+        self.relay = None
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        self.loop = asyncio.get_running_loop()
+        if self.relay is None:
+            self.relay = self.loop.create_task(self.relay_redis())
+
+        queue = asyncio.Queue(maxsize=NOTIFICATION_STREAM_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers.get(user_id, set())
+            queues.discard(queue)
+            if not queues:
+                self.subscribers.pop(user_id, None)
+
+    def dispatch(self, user_id, data):
+        for queue in list(self.subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                logger.warning('Dropped a notification of user %s.', user_id)
+
+    async def relay_redis(self):
+        while True:
+            try:
+                client = redis.asyncio.from_url(
+                    settings.NOTIFICATION_STREAM_REDIS_URL)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{NOTIFICATION_CHANNEL_PREFIX}*')
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        channel = message['channel'].decode('utf-8')
+                        user_id = int(channel[len(NOTIFICATION_CHANNEL_PREFIX):])
+                        self.dispatch(user_id, message['data'].decode('utf-8'))
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Lost the notifications channel, reconnecting...')
+                await asyncio.sleep(1)
+
+
+hub = NotificationHub()
+
+_redis_client = None
+_redis_client_lock = threading.Lock()
+
+
+def _get_redis_client():
+    global _redis_client  # pylint: disable=global-statement
+    with _redis_client_lock:
+        if _redis_client is None:
+            _redis_client = redis.Redis.from_url(
+                settings.NOTIFICATION_STREAM_REDIS_URL,
+                socket_connect_timeout=2, socket_timeout=2)
+        return _redis_client
+
+
+def publish_notifications(notifications):
+    """
+    Push the given notifications to the connected streams of their users.
+
+    Nothing is stored: a user who isn't connected sees them in the list as
+    usual. A failure to publish is logged and ignored, and nothing is
+    published when the stream is disabled.
+    """
+    if not settings.NOTIFICATION_STREAM_REDIS_URL:
+        return
+    for notification in notifications:
+        data = json.dumps(NotificationSerializer(notification).data)
+        try:
+            _get_redis_client().publish(
+                f'{NOTIFICATION_CHANNEL_PREFIX}{notification.user_id}', data)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Cannot publish the notification of user %s.',
+                             notification.user_id)
+
+
+def get_scope_user(scope):
+    """Return the user of the session cookie of an ASGI scope."""
+    headers = dict(scope['headers'])
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    engine = importlib.import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return auth.get_user(SimpleNamespace(session=session))
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def notification_stream(scope, receive, send):
+    """
+    ASGI application of the server-sent events of the notifications of the
+    logged in user.
+
+    A connected client only holds its connection: each new notification is
+    sent as a `notification` event with the same fields as the list API.
+    When the stream is disabled the response is a 204, which tells the
+    browser not to reconnect, so the client keeps polling instead.
+    """
+    if not settings.NOTIFICATION_STREAM_REDIS_URL:
+        await send({'type': 'http.response.start', 'status': 204,
+                    'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    user = await sync_to_async(get_scope_user)(scope)
+    if not user.is_authenticated:
+        await send({'type': 'http.response.start', 'status': 403,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Forbidden'})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': b': connected\n\n',
+                'more_body': True})
+
+    async with hub.subscribe(user.id) as queue:
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        get = None
+        try:
+            while True:
+                if get is None:
+                    get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    [get, disconnected], timeout=NOTIFICATION_STREAM_HEARTBEAT,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    break
+                if get in done:
+                    body = f'event: notification\ndata: {get.result()}\n\n'
+                    get = None
+                else:
+                    body = ': ping\n\n'
+                await send({'type': 'http.response.body',
+                            'body': body.encode('utf-8'), 'more_body': True})
+        finally:
+            disconnected.cancel()
+            if get is not None:
+                get.cancel()
@@ -2,8 +2,11 @@ import logging
 
 from celery import shared_task
 
+from .audit import write_log_entries
+from .counters import change_unread_counts
 from .emails import RegistrationEmailView
-from .models import User
+from .models import User, Notification
+from .stream import publish_notifications
 
 
 logger = logging.getLogger(__name__)
@@ -17,3 +20,21 @@ def send_account_created_email(user_id, temporary_password):
     RegistrationEmailView(user, temporary_password).send()
     logger.info('Account created email sent to %s %s.',
                 user.type, user.email)
+
+
+@shared_task
+def create_notifications(user_ids, message, url=None):
+    notifications = [
+        Notification(user_id=user_id, message=message, url=url)
+        for user_id in user_ids]
+    Notification.objects.bulk_create(notifications, batch_size=500)
+    # The bulk insert sends no signals, so the counters are updated here
+    change_unread_counts(user_ids)
+    publish_notifications(notifications)
+    logger.info('Created %s notifications.', len(notifications))
+
+
+@shared_task
+def create_log_entries(records):
+    write_log_entries(records)
+    logger.info('Created %s log entries.', len(records))
@@ -1,3 +1,105 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from .batching import batch_on_commit
+from .models import OutboxMessage
+from .outbox import enqueue, claim_outbox_messages, relay_outbox, purge_outbox
+from .tasks import create_notifications
+
+
+class Batch(list):
+
+    def __call__(self):
+        Batch.committed.append(list(self))
+
+
+class BatchOnCommitTest(TestCase):
+
+    def setUp(self):
+        Batch.committed = []
+
+    def test_batch_of_each_savepoint(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            batch_on_commit('test', Batch).append(1)
+            batch_on_commit('test', Batch).append(2)
+            batch_on_commit('other', Batch).append(3)
+            with transaction.atomic():
+                batch_on_commit('test', Batch).append(4)
+            try:
+                with transaction.atomic():
+                    batch_on_commit('test', Batch).append(5)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(Batch.committed, [[1, 2], [3], [4]])
+
+
+@mock.patch('users.outbox.current_app')
+class OutboxTest(TestCase):
+
+    def enqueue(self, current_app, no, dedup_key=None):
+        current_app.conf.task_always_eager = False
+        enqueue(create_notifications, dedup_key=dedup_key,
+                user_ids=[no], message='Message')
+
+    def test_dedup_key(self, current_app):
+        self.enqueue(current_app, 1, dedup_key='key')
+        self.enqueue(current_app, 2, dedup_key='key')
+        self.enqueue(current_app, 3)
+        self.enqueue(current_app, 4)
+        self.assertEqual(
+            list(OutboxMessage.objects.order_by('id')
+                 .values_list('kwargs__user_ids', flat=True)),
+            [[1], [3], [4]])
+
+    def test_dedup_key_kept_until_purged(self, current_app):
+        self.enqueue(current_app, 1, dedup_key='key')
+        OutboxMessage.objects.update(
+            dispatched_at=timezone.now() - timedelta(days=30))
+        self.enqueue(current_app, 2, dedup_key='key')
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+        self.assertEqual(purge_outbox(), 1)
+        self.enqueue(current_app, 3, dedup_key='key')
+        self.assertEqual(
+            OutboxMessage.objects.get().kwargs['user_ids'], [3])
+
+    def test_lease(self, current_app):
+        self.enqueue(current_app, 1)
+        self.enqueue(current_app, 2)
+        self.assertEqual(len(claim_outbox_messages(1)), 1)
+        self.assertEqual(len(claim_outbox_messages(10)), 1)
+        self.assertEqual(claim_outbox_messages(10), [])
+
+        # The messages of a relay that died are claimed again
+        OutboxMessage.objects.update(
+            leased_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_outbox_messages(10)), 2)
+
+    def test_partial_publish(self, current_app):
+        for no in range(3):
+            self.enqueue(current_app, no)
+        current_app.send_task.side_effect = [None, ConnectionError]
+
+        with self.assertLogs('users.outbox', 'ERROR'):
+            self.assertEqual(relay_outbox(), 1)
+        dispatched, pending, untried = OutboxMessage.objects.order_by('id')
+        self.assertIsNotNone(dispatched.dispatched_at)
+        self.assertIsNone(dispatched.leased_until)
+        for message in (pending, untried):
+            self.assertIsNone(message.dispatched_at)
+            self.assertIsNone(message.leased_until)
+            self.assertEqual(message.attempts, 1)
 
-# Create your tests here.
+        # The next run only publishes what's left
+        current_app.send_task.side_effect = None
+        current_app.send_task.reset_mock()
+        self.assertEqual(relay_outbox(), 2)
+        self.assertEqual(current_app.send_task.call_count, 2)
+        self.assertFalse(OutboxMessage.objects
+                         .filter(dispatched_at__isnull=True).exists())
@@ -107,6 +107,9 @@ class ProfileView(CustomLoginRequiredMixin, UpdateView):
         context['tab'] = 'profile'
         user = self.get_object()
         if user.type == Client.__name__:
-            context['wfp'] = user.subclass.current_wfp
-            context['wcp'] = user.subclass.current_wcp
+            client = Client.objects \
+                .select_related('current_wfp', 'current_wcp') \
+                .get(pk=user.pk)
+            context['wfp'] = client.current_wfp
+            context['wcp'] = client.current_wcp
         return context